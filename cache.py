@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Caching helpers for Psychosonus
+"""
+
+import asyncio
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Shared on-disk cache so popular lookups survive restarts
+CACHE_DB_PATH = Path.home() / '.cache' / 'psychosonus-cache.db'
+
+class SQLiteStore:
+    """Expiring key/value table in a SQLite file"""
+
+    def __init__(self, table: str, path: Path = CACHE_DB_PATH):
+        self.table = table
+        self.path = Path(path)
+        self._conn: Optional[sqlite3.Connection] = None
+        self._disabled = False
+        self._lock = threading.Lock()
+
+    def _connect(self) -> Optional[sqlite3.Connection]:
+        """Open the database on first use; expired rows are dropped when it is opened"""
+        if self._conn is None and not self._disabled:
+            try:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                conn = sqlite3.connect(str(self.path), isolation_level=None, check_same_thread=False)
+                conn.execute('PRAGMA journal_mode=WAL')
+                conn.execute('PRAGMA synchronous=NORMAL')
+                conn.execute(f'CREATE TABLE IF NOT EXISTS {self.table} '
+                             '(key TEXT PRIMARY KEY, expires_at REAL NOT NULL, payload BLOB NOT NULL)')
+                conn.execute(f'DELETE FROM {self.table} WHERE expires_at <= ?', (time.time(),))
+                self._conn = conn
+            except sqlite3.Error as e:
+                logger.warning(f"Persistent cache {self.path} unavailable, using memory only: {e}")
+                self._disabled = True
+        return self._conn
+
+    def _execute(self, sql: str, params: tuple = ()) -> Optional[list]:
+        with self._lock:
+            conn = self._connect()
+            if conn is None:
+                return None
+            try:
+                return conn.execute(sql, params).fetchall()
+            except sqlite3.Error as e:
+                logger.warning(f"Persistent cache error in {self.table}: {e}")
+                return None
+
+    def get(self, key: str) -> Optional[Tuple[bytes, float]]:
+        """Get (payload, expires_at) for a key that hasn't expired yet"""
+        rows = self._execute(f'SELECT payload, expires_at FROM {self.table} WHERE key = ? AND expires_at > ?',
+                             (key, time.time()))
+        return rows[0] if rows else None
+
+    def set(self, key: str, payload: bytes, expires_at: float):
+        self._execute(f'INSERT OR REPLACE INTO {self.table} (key, expires_at, payload) VALUES (?, ?, ?)',
+                      (key, expires_at, payload))
+
+    def delete(self, key: str):
+        self._execute(f'DELETE FROM {self.table} WHERE key = ?', (key,))
+
+    def clear(self):
+        self._execute(f'DELETE FROM {self.table}')
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries expire after a time-to-live
+
+    With a store, entries are also written through to SQLite (serialized with
+    dumps/loads) and memory misses are read back from it.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 3600, store: Optional[SQLiteStore] = None,
+                 dumps: Callable[[Any], bytes] = None, loads: Callable[[bytes], Any] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.store = store
+        self.dumps = dumps
+        self.loads = loads
+        self._data: OrderedDict = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Get a cached value, or default if missing or expired"""
+        value = self.get_memory(key, self)
+        if value is not self:
+            return value
+
+        if self.store is None:
+            return default
+        row = self.store.get(repr(key))
+        if row is None:
+            return default
+
+        payload, expires_at = row
+        try:
+            value = self.loads(payload)
+        except Exception as e:
+            logger.warning(f"Dropping unreadable cache entry {key!r}: {e}")
+            self.store.delete(repr(key))
+            return default
+        # Keep the entry's original expiry rather than starting a fresh TTL
+        self._set_memory(key, value, time.monotonic() + (expires_at - time.time()))
+        return value
+
+    def get_memory(self, key: Hashable, default: Any = None) -> Any:
+        """Like get, but never reads the store (safe to call on the event loop)"""
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None:
+                expires_at, value = item
+                if time.monotonic() < expires_at:
+                    self._data.move_to_end(key)
+                    return value
+                del self._data[key]
+        return default
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        """Store a value, evicting the least recently used entry if full"""
+        ttl = self.ttl if ttl is None else ttl
+        self._set_memory(key, value, time.monotonic() + ttl)
+        if self.store is not None:
+            self.store.set(repr(key), self.dumps(value), time.time() + ttl)
+
+    def _set_memory(self, key: Hashable, value: Any, expires_at: float):
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        """Remove a value from the cache"""
+        with self._lock:
+            item = self._data.pop(key, None)
+        if self.store is not None:
+            self.store.delete(repr(key))
+        return item[1] if item else default
+
+    def clear(self):
+        """Remove every cached value"""
+        with self._lock:
+            self._data.clear()
+        if self.store is not None:
+            self.store.clear()
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.get(key, self) is not self
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._data)
+
+def search_key(query: str, limit: int) -> tuple:
+    """Normalized cache key for a search query"""
+    return (query.strip().lower(), limit)
+
+class SingleFlight:
+    """Shares one in-flight lookup between concurrent callers asking for the same key
+
+    Keys are only compared within one instance, so each caller keeps its own.
+    Use it from a single event loop.
+    """
+
+    def __init__(self):
+        self._tasks: Dict[Hashable, asyncio.Future] = {}
+
+    async def run(self, key: Hashable, make_coro: Callable[[], Awaitable[Any]]) -> Any:
+        """Await the lookup already running for key, or start one with make_coro()"""
+        task = self._tasks.get(key)
+        if task is None:
+            task = asyncio.ensure_future(make_coro())
+            self._tasks[key] = task
+            task.add_done_callback(lambda _: self._tasks.pop(key, None))
+        # Shielded so one caller being cancelled (e.g. a prefetch) doesn't fail the others
+        return await asyncio.shield(task)
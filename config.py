@@ -6,10 +6,25 @@ Simplified Configuration manager for Psychosonus
 import json
 import logging
 import secrets
+from pathlib import Path
 from typing import Dict, Any
 
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
+
 logger = logging.getLogger(__name__)
 
+REQUIRED_FIELDS = ('discord_token', 'discord_client_id', 'discord_client_secret')
+
+# Values from config.json.example that mean "not filled in yet"
+PLACEHOLDER_VALUES = frozenset(
+    [f"YOUR_{field.upper()}_HERE" for field in REQUIRED_FIELDS] +
+    [f"{field.upper()}_GOES_HERE" for field in REQUIRED_FIELDS]
+)
+
 class Config:
     """Configuration manager with simplified URL handling"""
     
@@ -17,33 +32,34 @@ class Config:
         self.config_path = config_path
         self.data = self._load_config()
         self._validate_config()
+        # Domain and URLs don't change after loading, so derive them once
+        self._domain = self._resolve_domain()
+        self._port = self.get('port', self.get('web_port', 8888))
+        self._base_url = f"{self.get_protocol()}://{self._domain}"
+        self._discord_redirect_uri = f"{self._base_url}/auth/callback"
+        self._spotify_redirect_uri = f"{self._base_url}/callback/spotify"
     
     def _load_config(self) -> Dict[str, Any]:
         """Load configuration from file"""
         try:
-            with open(self.config_path, 'r') as f:
-                return json.load(f)
+            data = _json_loads(Path(self.config_path).read_bytes())
         except FileNotFoundError:
             logger.error(f"Config file {self.config_path} not found!")
             raise
-        except json.JSONDecodeError as e:
+        except ValueError as e:
+            # json.JSONDecodeError and orjson.JSONDecodeError are both ValueErrors
             logger.error(f"Invalid JSON in config file: {e}")
             raise
+        
+        if not isinstance(data, dict):
+            raise ValueError(f"{self.config_path} must contain a JSON object")
+        return data
     
     def _validate_config(self):
         """Validate required configuration"""
-        required_fields = [
-            'discord_token',
-            'discord_client_id',
-            'discord_client_secret'
-        ]
-        
-        for field in required_fields:
-            if not self.data.get(field) or self.data[field] in [
-                f"YOUR_{field.upper()}_HERE",
-                f"{field.upper()}_GOES_HERE",
-                ""
-            ]:
+        for field in REQUIRED_FIELDS:
+            value = self.data.get(field)
+            if not value or value in PLACEHOLDER_VALUES:
                 logger.error(f"Missing or invalid {field} in config.json")
                 raise ValueError(f"Please configure {field} in config.json")
         
@@ -58,6 +74,9 @@ class Config:
     
     def get_domain(self) -> str:
         """Get the domain (with smart localhost detection)"""
+        return self._domain
+    
+    def _resolve_domain(self) -> str:
         domain = self.get('domain', 'localhost')
         # Handle common variations
         if domain in ['localhost', '127.0.0.1', '0.0.0.0']:
@@ -66,7 +85,7 @@ class Config:
     
     def get_port(self) -> int:
         """Get the web port (support both 'port' and 'web_port' for compatibility)"""
-        return self.get('port', self.get('web_port', 8888))
+        return self._port
     
     def is_localhost(self) -> bool:
         """Check if running on localhost"""
@@ -83,17 +102,15 @@ class Config:
     
     def get_base_url(self) -> str:
         """Get the complete base URL without port for external use"""
-        domain = self.get_domain()
-        protocol = self.get_protocol()
-        return f"{protocol}://{domain}"
+        return self._base_url
 
     def get_discord_redirect_uri(self) -> str:
         """Get the Discord OAuth2 redirect URI without port"""
-        return f"{self.get_base_url()}/auth/callback"
+        return self._discord_redirect_uri
     
     def get_spotify_redirect_uri(self) -> str:
         """Get the Spotify redirect URI"""
-        return f"{self.get_base_url()}/callback/spotify"
+        return self._spotify_redirect_uri
     
     def get_session_secret(self) -> str:
         """Get session secret (auto-generated if not provided)"""
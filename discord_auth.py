@@ -3,16 +3,42 @@
 Discord OAuth2 authentication for Psychosonus
 """
 
+import asyncio
+import json
 import logging
+import aiohttp
 import requests
-from typing import Dict, Any, Optional, List
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from typing import Dict, Any, Optional, List, Set, Tuple
 from urllib.parse import urlencode
 import jwt
 import time
 import secrets
 
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
+
 logger = logging.getLogger(__name__)
 
+# Shared HTTP session so OAuth logins reuse pooled keep-alive connections to Discord
+HTTP = requests.Session()
+HTTP.mount('https://', HTTPAdapter(
+    pool_connections=4,
+    pool_maxsize=20,
+    # urllib3 never retries the POSTs here (a code exchange can't be replayed), only the GETs
+    max_retries=Retry(total=2, backoff_factor=0.2, status_forcelist=[500, 502, 503, 504])
+))
+
+AUTHORIZE_URL = "https://discord.com/api/oauth2/authorize"
+USER_SCOPES = 'identify guilds'
+# Invite flow also adds the bot with slash commands (connect + speak permissions)
+BOT_SCOPES = f'{USER_SCOPES} bot applications.commands'
+BOT_PERMISSIONS = '3145728'
+
 class DiscordAuth:
     """Discord OAuth2 authentication handler"""
     
@@ -22,6 +48,20 @@ class DiscordAuth:
         self.redirect_uri = redirect_uri
         self.api_endpoint = "https://discord.com/api/v10"
         self.oauth_url = "https://discord.com/api/oauth2/token"
+        # Token request fields that never change, urlencoded once; calls only append the code/token
+        exchange_fields = {
+            'client_id': client_id,
+            'client_secret': client_secret,
+            'grant_type': 'authorization_code',
+        }
+        if redirect_uri:
+            exchange_fields['redirect_uri'] = redirect_uri
+        self._exchange_form = urlencode(exchange_fields)
+        self._refresh_form = urlencode({
+            'client_id': client_id,
+            'client_secret': client_secret,
+            'grant_type': 'refresh_token',
+        })
         
     def get_authorization_url(self, state: str = None, include_bot: bool = True) -> str:
         if state is None:
@@ -31,39 +71,28 @@ class DiscordAuth:
             'client_id': self.client_id,
             'redirect_uri': self.redirect_uri,
             'response_type': 'code',
-            'scope': 'identify guilds',
+            'scope': BOT_SCOPES if include_bot else USER_SCOPES,
             'state': state  # Always include state for CSRF protection
         }
 
         if include_bot:
-            # Add bot + slash command scopes for invite flow
-            params['scope'] += ' bot applications.commands'
-            # Adjust permissions as needed (example: connect, speak, etc.)
-            params['permissions'] = '3145728'
+            params['permissions'] = BOT_PERMISSIONS
 
-        if state:
-            params['state'] = state
-
-        return f"https://discord.com/api/oauth2/authorize?{urlencode(params)}"
+        return f"{AUTHORIZE_URL}?{urlencode(params)}"
     
     def refresh_token(self, refresh_token: str) -> Optional[Dict[str, Any]]:
         """Refresh the access token using a refresh token"""
         try:
-            data = {
-                'client_id': self.client_id,
-                'client_secret': self.client_secret,
-                'grant_type': 'refresh_token',
-                'refresh_token': refresh_token,
-            }
+            data = f"{self._refresh_form}&{urlencode({'refresh_token': refresh_token})}"
 
             headers = {
                 'Content-Type': 'application/x-www-form-urlencoded'
             }
 
-            response = requests.post(self.oauth_url, data=data, headers=headers)
+            response = HTTP.post(self.oauth_url, data=data, headers=headers, timeout=10)
 
             if response.status_code == 200:
-                return response.json()
+                return _json_loads(response.content)
             else:
                 logger.error(f"Token refresh failed: {response.status_code} - {response.text}")
                 return None
@@ -75,22 +104,16 @@ class DiscordAuth:
     def exchange_code(self, code: str) -> Optional[Dict[str, Any]]:
         """Exchange authorization code for access token"""
         try:
-            data = {
-                'client_id': self.client_id,
-                'client_secret': self.client_secret,
-                'grant_type': 'authorization_code',
-                'code': code,
-                'redirect_uri': self.redirect_uri,
-            }
+            data = f"{self._exchange_form}&{urlencode({'code': code})}"
 
             headers = {
                 'Content-Type': 'application/x-www-form-urlencoded'
             }
 
-            response = requests.post(self.oauth_url, data=data, headers=headers)
+            response = HTTP.post(self.oauth_url, data=data, headers=headers, timeout=10)
 
             if response.status_code == 200:
-                token_data = response.json()
+                token_data = _json_loads(response.content)
                 if 'refresh_token' not in token_data:
                     logger.warning("No refresh token provided in the response.")
                 return token_data
@@ -110,10 +133,10 @@ class DiscordAuth:
                 'Content-Type': 'application/json'
             }
             
-            response = requests.get(f"{self.api_endpoint}/users/@me", headers=headers)
+            response = HTTP.get(f"{self.api_endpoint}/users/@me", headers=headers, timeout=10)
             
             if response.status_code == 200:
-                return response.json()
+                return _json_loads(response.content)
             else:
                 logger.error(f"Get user info failed: {response.status_code} - {response.text}")
                 return None
@@ -130,10 +153,10 @@ class DiscordAuth:
                 'Content-Type': 'application/json'
             }
             
-            response = requests.get(f"{self.api_endpoint}/users/@me/guilds", headers=headers)
+            response = HTTP.get(f"{self.api_endpoint}/users/@me/guilds", headers=headers, timeout=10)
             
             if response.status_code == 200:
-                return response.json()
+                return _json_loads(response.content)
             else:
                 logger.error(f"Get user guilds failed: {response.status_code} - {response.text}")
                 return []
@@ -142,16 +165,71 @@ class DiscordAuth:
             logger.error(f"Error getting user guilds: {e}")
             return []
     
+    async def exchange_code_async(self, session: aiohttp.ClientSession, code: str) -> Optional[Dict[str, Any]]:
+        """Exchange authorization code for access token over the bot's pooled aiohttp session"""
+        data = f"{self._exchange_form}&{urlencode({'code': code})}"
+        headers = {'Content-Type': 'application/x-www-form-urlencoded'}
+        try:
+            async with session.post(self.oauth_url, data=data, headers=headers,
+                                    timeout=aiohttp.ClientTimeout(total=10)) as response:
+                if response.status == 200:
+                    return _json_loads(await response.read())
+                logger.error(f"Token exchange failed: {response.status} - {await response.text()}")
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.error(f"Error exchanging code: {e}")
+        return None
+    
+    async def _get_json_async(self, session: aiohttp.ClientSession, path: str, access_token: str) -> Optional[Any]:
+        """GET a Discord API path with a user token, return the JSON body or None on failure"""
+        headers = {'Authorization': f'Bearer {access_token}'}
+        try:
+            async with session.get(f"{self.api_endpoint}{path}", headers=headers,
+                                   timeout=aiohttp.ClientTimeout(total=10)) as response:
+                if response.status == 200:
+                    return _json_loads(await response.read())
+                logger.error(f"Discord API GET {path} failed: {response.status} - {await response.text()}")
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.error(f"Error calling Discord API {path}: {e}")
+        return None
+    
+    async def get_user_and_guilds_async(self, session: aiohttp.ClientSession,
+                                        access_token: str) -> Tuple[Optional[Dict[str, Any]], List[Dict[str, Any]]]:
+        """Fetch user info and guilds concurrently over the bot's pooled aiohttp session"""
+        user_info, guilds = await asyncio.gather(
+            self._get_json_async(session, '/users/@me', access_token),
+            self._get_json_async(session, '/users/@me/guilds', access_token)
+        )
+        return user_info, guilds or []
+    
+    async def login_async(self, session: aiohttp.ClientSession,
+                          code: str) -> Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]], List[Dict[str, Any]]]:
+        """Run the whole OAuth login (token, then user and guilds at once) on one pooled session"""
+        token_data = await self.exchange_code_async(session, code)
+        if not token_data:
+            return None, None, []
+        user_info, guilds = await self.get_user_and_guilds_async(session, token_data['access_token'])
+        return token_data, user_info, guilds
+    
+    def login(self, code: str) -> Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]], List[Dict[str, Any]]]:
+        """Blocking version of login_async, for use before the bot's HTTP session exists"""
+        token_data = self.exchange_code(code)
+        if not token_data:
+            return None, None, []
+        user_info = self.get_user_info(token_data['access_token'])
+        guilds = self.get_user_guilds(token_data['access_token']) if user_info else []
+        return token_data, user_info, guilds
+    
     def create_session_token(self, user_data: Dict[str, Any], guilds: List[Dict[str, Any]], secret_key: str) -> str:
         """Create a JWT session token"""
+        now = int(time.time())
         payload = {
             'user_id': user_data['id'],
             'username': user_data['username'],
             'discriminator': user_data.get('discriminator', '0'),
             'avatar': user_data.get('avatar'),
             'guilds': [{'id': g['id'], 'name': g['name']} for g in guilds],
-            'exp': int(time.time()) + 3600,  # 1 hour expiry
-            'iat': int(time.time())
+            'exp': now + 3600,  # 1 hour expiry
+            'iat': now
         }
         
         return jwt.encode(payload, secret_key, algorithm='HS256')
@@ -174,16 +252,19 @@ class ServerPermissions:
     
     def __init__(self, bot):
         self.bot = bot
-        self.authorized_users = {}  # guild_id -> [user_ids]
+        self.authorized_users: Dict[int, Set[int]] = {}  # guild_id -> explicitly authorized user IDs
     
     def user_has_access(self, user_id: str, guild_id: str) -> bool:
         """Check if user has access to guild's queue"""
         try:
-            guild = self.bot.get_guild(int(guild_id))
+            guild_id, user_id = int(guild_id), int(user_id)
+            if user_id in self.authorized_users.get(guild_id, ()):
+                return True
+            guild = self.bot.get_guild(guild_id)
             if not guild:
                 logger.warning(f"Guild {guild_id} not found")
                 return False
-            member = guild.get_member(int(user_id))
+            member = guild.get_member(user_id)
             if not member:
                 logger.warning(f"User {user_id} not found in guild {guild_id}")
                 return False
@@ -195,19 +276,20 @@ class ServerPermissions:
     
     def get_user_accessible_guilds(self, user_guilds: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """Get guilds where user has access and bot is present"""
+        # Look up the bot's guilds and voice guild once instead of per user guild
+        bot_guild_ids = {guild.id for guild in self.bot.guilds}
+        voice_client = self.bot.voice_client
+        voice_guild_id = voice_client.guild.id if voice_client and voice_client.guild else None
         accessible_guilds = []
         
         for user_guild in user_guilds:
-            guild_id = user_guild['id']
-            bot_guild = self.bot.get_guild(int(guild_id))
-            
-            if bot_guild:
+            guild_id = int(user_guild['id'])
+            if guild_id in bot_guild_ids:
                 accessible_guilds.append({
-                    'id': guild_id,
-                    'name': user_guild['name'],
+                    'id': user_guild['id'],
+                    'name': user_guild.get('name', 'Unknown Server'),
                     'icon': user_guild.get('icon'),
-                    'bot_connected': self.bot.voice_client is not None and 
-                                   self.bot.voice_client.guild.id == int(guild_id)
+                    'bot_connected': guild_id == voice_guild_id
                 })
         
         return accessible_guilds
\ No newline at end of file
@@ -5,7 +5,14 @@ Discord bot functionality for Psychosonus
 
 import asyncio
 import logging
-from typing import Optional
+import os
+import shlex
+import shutil
+import tempfile
+import time
+from collections import defaultdict, deque
+from typing import Deque, Dict, List, Optional, Set
+import aiohttp
 import discord
 from discord.ext import commands
 
@@ -16,6 +23,15 @@ from youtube_manager import YouTubeManager
 
 logger = logging.getLogger(__name__)
 
+FFMPEG_RECONNECT_OPTIONS = '-reconnect 1 -reconnect_streamed 1 -reconnect_delay_max 5'
+
+# Error replies per guild allowed within the window; the rest are only logged
+ERROR_REPLY_LIMIT = 3
+ERROR_REPLY_WINDOW = 10  # seconds
+
+# Stop walking the queue after this many tracks in a row fail to start (e.g. YouTube is blocking us)
+MAX_CONSECUTIVE_FAILURES = 5
+
 class MusicBot(commands.Bot):
     """Main Discord bot class"""
     
@@ -37,6 +53,20 @@ class MusicBot(commands.Bot):
         self.is_playing = False
         self.current_channel = None
         self.current_guild_id = None
+        self.http_session: Optional[aiohttp.ClientSession] = None
+        self._prefetch_task: Optional[asyncio.Task] = None
+        self._prefetch_dir: Optional[str] = None
+        self._preloaded_song: Optional[Song] = None
+        self._stop_requested = False  # Set when the current track is stopped on purpose
+        self._background_tasks: Set[asyncio.Task] = set()  # Fire-and-forget tasks, kept alive until done
+        self._error_replies: Dict[Optional[int], Deque[float]] = defaultdict(lambda: deque(maxlen=ERROR_REPLY_LIMIT))
+        self._ffmpeg_options = self._build_ffmpeg_options(config.get('default_volume', 0.5))
+        self._dashboard_url = f"https://{config.get_domain()}:{config.get_port()}"
+        self._prefetch_max_bytes = config.get('prefetch_max_mb', 50) * 1024 * 1024
+        # Info embeds never change, so build them once instead of on every command
+        self._help_embed = self._build_help_embed()
+        self._github_embed = self._build_github_embed()
+        self._invite_embed: Optional[discord.Embed] = None
         
         # Add commands
         self.add_commands()
@@ -61,9 +91,7 @@ class MusicBot(commands.Bot):
                 
                 self.current_channel = ctx.channel
                 self.current_guild_id = ctx.guild.id
-                port = self.config.get('port', 8888)
-                domain = self.config.get_domain()
-                await ctx.send(f"🎵 Joined **{channel.name}**\n🌐 Dashboard: https://{domain}:{port}")
+                await ctx.send(f"🎵 Joined **{channel.name}**\n🌐 Dashboard: {self._dashboard_url}")
                 
                 if not self.is_playing:
                     await self.play_next()
@@ -76,11 +104,7 @@ class MusicBot(commands.Bot):
         async def leave_voice(ctx):
             """Leave voice channel"""
             if self.voice_client:
-                await self.voice_client.disconnect()
-                self.voice_client = None
-                self.is_playing = False
-                self.current_channel = None
-                self.current_guild_id = None
+                await self.leave_voice()
                 await ctx.send("👋 Left voice channel")
             else:
                 await ctx.send("❌ Not in a voice channel")
@@ -88,60 +112,19 @@ class MusicBot(commands.Bot):
         @self.command(name='invite')
         async def create_invite(ctx):
             """Create bot invite link"""
-            permissions = discord.Permissions()
-            permissions.connect = True
-            permissions.speak = True
-            permissions.use_voice_activation = True
-            permissions.read_messages = True
-            permissions.send_messages = True
-            permissions.embed_links = True
-            permissions.read_message_history = True
-            
-            invite_url = discord.utils.oauth_url(
-                self.user.id, 
-                permissions=permissions,
-                scopes=['bot', 'applications.commands']
-            )
-            
-            embed = discord.Embed(
-                title="🎵 Invite Psychosonus",
-                description=f"[Click here to add me to your server!]({invite_url})",
-                color=0x00ff88
-            )
-            embed.add_field(
-                name="Dashboard Access", 
-                value=f"After inviting, authorize at: http://{domain}:{self.config.get('port', 8888)}/auth",
-                inline=False
-            )
-            await ctx.send(embed=embed)
+            # Needs self.user, so it can only be built once the bot has logged in
+            if self._invite_embed is None:
+                self._invite_embed = self._build_invite_embed()
+            await ctx.send(embed=self._invite_embed)
         
         @self.command(name='github', aliases=['gh', 'source', 'code'])
         async def show_github(ctx):
             """Show GitHub repository link"""
-            github_url = self.config.get('github_repo', 'https://github.com/warmbo/psychosonus')
-            
-            embed = discord.Embed(
-                title="📁 Psychosonus Source Code",
-                description=f"[View on GitHub]({github_url})",
-                color=0x00ff88
-            )
-            embed.add_field(
-                name="Features",
-                value="• Discord Music Bot\n• Web Dashboard\n• Spotify + YouTube\n• Queue Management",
-                inline=True
-            )
-            embed.add_field(
-                name="Tech Stack", 
-                value="• Python + discord.py\n• Flask Web API\n• yt-dlp + spotipy\n• JWT Authentication",
-                inline=True
-            )
-            await ctx.send(embed=embed)
+            await ctx.send(embed=self._github_embed)
         
         @self.command(name='dashboard', aliases=['web', 'ui'])
         async def dashboard_info(ctx):
             """Show dashboard information with a unique URL for this user/channel context"""
-            port = self.config.get('port', 8888)
-            domain = self.config.get_domain()
             # Generate a unique token or query string for this user/channel/guild
             user_id = ctx.author.id
             guild_id = ctx.guild.id if ctx.guild else None
@@ -150,7 +133,7 @@ class MusicBot(commands.Bot):
                 await ctx.send("❌ You must be in a voice channel to get a dashboard link for your queue.")
                 return
             # For simplicity, use a signed token or just pass IDs (for demo, use query string)
-            dashboard_url = f"https://{domain}:{port}/dashboard?guild={guild_id}&channel={channel_id}&user={user_id}"
+            dashboard_url = f"{self._dashboard_url}/dashboard?guild={guild_id}&channel={channel_id}&user={user_id}"
             embed = discord.Embed(
                 title="🌐 Web Dashboard",
                 description=f"Access your queue dashboard here: [Open Dashboard]({dashboard_url})",
@@ -158,7 +141,7 @@ class MusicBot(commands.Bot):
             )
             embed.add_field(
                 name="Authentication Required",
-                value=f"Sign in with Discord at: https://{domain}:{port}/auth",
+                value=f"Sign in with Discord at: {self._dashboard_url}/auth",
                 inline=False
             )
             embed.add_field(
@@ -176,21 +159,18 @@ class MusicBot(commands.Bot):
         @self.command(name='queue', aliases=['q'])
         async def show_queue(ctx):
             """Show current queue"""
-            queue_list = self.music_queue.get_queue_list()
-            if not queue_list:
+            _, current, upcoming = self.music_queue.get_snapshot()
+            if not current and not upcoming:
                 await ctx.send("📭 Queue is empty")
                 return
             
-            queue_text = []
-            for i, item in enumerate(queue_list[:10]):  # Show first 10
-                song = item['song']
-                if item['current']:
-                    prefix = "▶️ "
-                else:
-                    prefix = f"{i}. "
-                queue_text.append(f"{prefix}**{song['title']}** - {song['artist']} `{song['duration']}`")
+            shown = 9 if current else 10  # Show first 10 including the current track
+            queue_text = [f"{i}. **{song['title']}** - {song['artist']} `{song['duration']}`"
+                          for i, song in enumerate(upcoming[:shown], start=1)]
+            if current:
+                queue_text.insert(0, f"▶️ **{current['title']}** - {current['artist']} `{current['duration']}`")
             
-            remaining = len(queue_list) - 10
+            remaining = len(upcoming) - shown
             if remaining > 0:
                 queue_text.append(f"... and {remaining} more songs")
             
@@ -210,9 +190,10 @@ class MusicBot(commands.Bot):
         async def stop_music(ctx):
             """Stop music and clear queue"""
             if self.voice_client:
-                self.voice_client.stop()
+                # Same path as the dashboard's stop, so the player callback doesn't start another song
+                self._stop_playback()
                 self.music_queue.clear()
-                self.is_playing = False
+                self._drop_prefetch()
                 await ctx.send("⏹️ Stopped and cleared queue")
             else:
                 await ctx.send("❌ Not playing anything")
@@ -230,64 +211,133 @@ class MusicBot(commands.Bot):
             
             # Search for the song on YouTube only (avoid Spotify DRM issues)
             await ctx.send(f"🔍 Searching for: **{query}**")
-            tracks = YouTubeManager.search_tracks(query, limit=1)
+            song = await YouTubeManager.search_and_resolve_async(query)
             
-            if not tracks:
+            if not song:
                 await ctx.send("❌ No results found")
                 return
             
-            song = tracks[0]
             if self.music_queue.add_song(song):
                 await ctx.send(f"✅ Added to queue: **{song.title}** - {song.artist}")
                 
                 if not self.is_playing:
                     await self.play_next()
+                else:
+                    self._start_prefetch()
             else:
                 await ctx.send("❌ Queue is full")
         
         @self.command(name='help', aliases=['commands'])
         async def show_help(ctx):
             """Show bot commands"""
-            embed = discord.Embed(
-                title="🎵 Psychosonus Commands",
-                description="Discord Music Bot with Web Dashboard",
-                color=0x00ff88
-            )
-            
-            embed.add_field(
-                name="🎶 Music Commands",
-                value="`!join` - Join voice channel\n"
-                      "`!play <song>` - Search and play\n"
-                      "`!queue` - Show queue\n" 
-                      "`!skip` - Skip current song\n"
-                      "`!stop` - Stop and clear queue\n"
-                      "`!leave` - Leave voice channel",
-                inline=False
-            )
-            
-            embed.add_field(
-                name="🌐 Web Dashboard",
-                value="`!dashboard` - Dashboard info\n"
-                      "`!invite` - Get invite link",
-                inline=True
-            )
-            
-            embed.add_field(
-                name="ℹ️ Info Commands", 
-                value="`!github` - View source code\n"
-                      "`!help` - Show this help",
-                inline=True
-            )
-            
-            await ctx.send(embed=embed)
+            await ctx.send(embed=self._help_embed)
+    
+    def _build_invite_embed(self) -> discord.Embed:
+        """Build the !invite embed"""
+        permissions = discord.Permissions()
+        permissions.connect = True
+        permissions.speak = True
+        permissions.use_voice_activation = True
+        permissions.read_messages = True
+        permissions.send_messages = True
+        permissions.embed_links = True
+        permissions.read_message_history = True
+        
+        invite_url = discord.utils.oauth_url(
+            self.user.id, 
+            permissions=permissions,
+            scopes=['bot', 'applications.commands']
+        )
+        
+        embed = discord.Embed(
+            title="🎵 Invite Psychosonus",
+            description=f"[Click here to add me to your server!]({invite_url})",
+            color=0x00ff88
+        )
+        embed.add_field(
+            name="Dashboard Access", 
+            value=f"After inviting, authorize at: {self._dashboard_url}/auth",
+            inline=False
+        )
+        return embed
+    
+    def _build_github_embed(self) -> discord.Embed:
+        """Build the !github embed"""
+        github_url = self.config.get('github_repo', 'https://github.com/warmbo/psychosonus')
+        
+        embed = discord.Embed(
+            title="📁 Psychosonus Source Code",
+            description=f"[View on GitHub]({github_url})",
+            color=0x00ff88
+        )
+        embed.add_field(
+            name="Features",
+            value="• Discord Music Bot\n• Web Dashboard\n• Spotify + YouTube\n• Queue Management",
+            inline=True
+        )
+        embed.add_field(
+            name="Tech Stack", 
+            value="• Python + discord.py\n• Flask Web API\n• yt-dlp + spotipy\n• JWT Authentication",
+            inline=True
+        )
+        return embed
+    
+    @staticmethod
+    def _build_help_embed() -> discord.Embed:
+        """Build the !help embed"""
+        embed = discord.Embed(
+            title="🎵 Psychosonus Commands",
+            description="Discord Music Bot with Web Dashboard",
+            color=0x00ff88
+        )
+        
+        embed.add_field(
+            name="🎶 Music Commands",
+            value="`!join` - Join voice channel\n"
+                  "`!play <song>` - Search and play\n"
+                  "`!queue` - Show queue\n" 
+                  "`!skip` - Skip current song\n"
+                  "`!stop` - Stop and clear queue\n"
+                  "`!leave` - Leave voice channel",
+            inline=False
+        )
+        
+        embed.add_field(
+            name="🌐 Web Dashboard",
+            value="`!dashboard` - Dashboard info\n"
+                  "`!invite` - Get invite link",
+            inline=True
+        )
+        
+        embed.add_field(
+            name="ℹ️ Info Commands", 
+            value="`!github` - View source code\n"
+                  "`!help` - Show this help",
+            inline=True
+        )
+        return embed
+    
+    async def setup_hook(self):
+        """Create shared resources on the bot's event loop"""
+        connector = aiohttp.TCPConnector(limit=32, keepalive_timeout=60)
+        self.http_session = aiohttp.ClientSession(connector=connector)
+        self._prefetch_dir = tempfile.mkdtemp(prefix='psychosonus-')
+    
+    async def close(self):
+        """Close shared resources before shutting down"""
+        if self._prefetch_task:
+            self._prefetch_task.cancel()
+        if self.http_session:
+            await self.http_session.close()
+        if self._prefetch_dir:
+            await asyncio.to_thread(shutil.rmtree, self._prefetch_dir, ignore_errors=True)
+        await super().close()
     
     async def on_ready(self):
         """Bot ready event"""
         logger.info(f'🎵 {self.user} is online!')
-        port = self.config.get('port', 8888)
-        domain = self.config.get_domain()
-        logger.info(f'🌐 Web dashboard: https://{domain}:{port}')
-        logger.info(f'🔐 Auth endpoint: https://{domain}:{port}/auth')
+        logger.info(f'🌐 Web dashboard: {self._dashboard_url}')
+        logger.info(f'🔐 Auth endpoint: {self._dashboard_url}/auth')
 
     async def on_command_error(self, ctx, error):
         """Handle command errors"""
@@ -295,110 +345,411 @@ class MusicBot(commands.Bot):
             return
         
         logger.error(f"Command error: {error}")
-        await ctx.send(f"❌ An error occurred: {str(error)}")
+        
+        # Don't let a burst of failing commands turn into a burst of REST calls
+        now = time.monotonic()
+        replies = self._error_replies[ctx.guild.id if ctx.guild else None]
+        if len(replies) == replies.maxlen and now - replies[0] < ERROR_REPLY_WINDOW:
+            return
+        replies.append(now)
+        await ctx.send(f"❌ An error occurred: {str(error)[:200]}")
     
     def get_current_guild_id(self) -> Optional[int]:
         """Get the current guild ID where bot is active"""
         return self.current_guild_id
     
-    async def play_next(self):
-        """Play next song in queue"""
-        if not self.voice_client:
-            self.is_playing = False
+    async def leave_voice(self):
+        """Disconnect from voice and reset playback state"""
+        # Stop on purpose first, so the player callback doesn't start the next song mid-disconnect
+        self._stop_playback()
+        self._drop_prefetch()
+        voice_client, self.voice_client = self.voice_client, None
+        self.current_channel = None
+        self.current_guild_id = None
+        if voice_client:
+            await voice_client.disconnect()
+    
+    def request_playback(self):
+        """Start playback if connected and idle; safe to call from any thread and does not wait"""
+        self.loop.call_soon_threadsafe(self._start_if_idle)
+    
+    def request_leave(self):
+        """Disconnect from voice; safe to call from any thread and does not wait"""
+        self.loop.call_soon_threadsafe(lambda: self._spawn(self.leave_voice()))
+    
+    def request_prefetch(self):
+        """Prefetch the next song if one was queued behind the current track; safe to call from any thread"""
+        self.loop.call_soon_threadsafe(self._start_prefetch)
+    
+    def request_skip(self):
+        """Skip to the next track, or start one if nothing is loaded; safe to call from any thread"""
+        self.loop.call_soon_threadsafe(self._skip)
+    
+    def _skip(self):
+        if self.voice_client and (self.voice_client.is_playing() or self.voice_client.is_paused()):
+            self.voice_client.stop()  # after_playing moves on to the next track
+        else:
+            self._start_if_idle()
+    
+    def request_stop(self):
+        """Stop the current track without advancing the queue; safe to call from any thread"""
+        self.loop.call_soon_threadsafe(self._stop_playback)
+    
+    def _stop_playback(self):
+        if self.voice_client and (self.voice_client.is_playing() or self.voice_client.is_paused()):
+            self._stop_requested = True
+            self.voice_client.stop()
+        self.is_playing = False
+        self.music_queue.clear_current()
+    
+    def _track_finished(self):
+        """Runs on the event loop after a track ends; starts the next one unless playback was stopped"""
+        if self._stop_requested:
+            self._stop_requested = False
             return
+        self._spawn(self.play_next())
+    
+    def cancel_prefetch(self):
+        """Abandon prefetched work after the queue was cleared; safe to call from any thread"""
+        self.loop.call_soon_threadsafe(self._drop_prefetch)
+    
+    def _drop_prefetch(self):
+        """Cancel a running prefetch and release the preloaded FFmpeg process and buffer"""
+        if self._prefetch_task and not self._prefetch_task.done():
+            self._prefetch_task.cancel()
+        self._prefetch_task = None
         
-        next_song = self.music_queue.get_next()
-        if not next_song:
-            self.is_playing = False
-            if self.current_channel:
-                await self.current_channel.send("📭 Queue is empty")
+        song, self._preloaded_song = self._preloaded_song, None
+        if song and song.preloaded_source:
+            song.preloaded_source.cleanup()
+            song.preloaded_source = None
+            self._discard_buffer(song)
+    
+    def _start_prefetch(self):
+        """Start prefetching the next song unless a prefetch is already running"""
+        if not self.is_playing or (self._prefetch_task and not self._prefetch_task.done()):
             return
+        self._prefetch_task = asyncio.create_task(self._prefetch_next())
+    
+    def _spawn(self, coro) -> asyncio.Task:
+        """Start a task nobody awaits, holding a reference to it and logging its failure"""
+        task = asyncio.ensure_future(coro)
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_task_done)
+        return task
+    
+    def _background_task_done(self, task: asyncio.Task):
+        self._background_tasks.discard(task)
+        if not task.cancelled() and task.exception():
+            logger.error(f"Background task failed: {task.exception()!r}")
+    
+    def _start_if_idle(self):
+        """Kick off play_next on the event loop unless something is already playing"""
+        if self.voice_client and not self.is_playing:
+            # Claim the player now so back-to-back requests don't start two tracks
+            self.is_playing = True
+            self._spawn(self.play_next())
+    
+    async def play_next(self):
+        """Play next song in queue, skipping songs that fail to start"""
+        # A buffer still downloading would race this track for bandwidth
+        if self._prefetch_task and not self._prefetch_task.done():
+            self._prefetch_task.cancel()
+        self._prefetch_task = None
         
-        self.is_playing = True
-        
-        try:
-            # Handle Spotify tracks by searching YouTube
-            if next_song.source == 'spotify':
+        failures = 0
+        while True:
+            if failures >= MAX_CONSECUTIVE_FAILURES:
+                self.is_playing = False
+                logger.error(f"Pausing playback after {failures} tracks in a row failed to start")
                 if self.current_channel:
-                    await self.current_channel.send(f"🔍 Finding YouTube source for: **{next_song.title}** by {next_song.artist}")
-                
-                # Try multiple search variations
-                search_queries = [
-                    f"{next_song.artist} {next_song.title}",
-                    f"{next_song.title} {next_song.artist}",
-                    f"{next_song.title}",
-                    f"{next_song.artist} - {next_song.title}"
-                ]
-                
-                youtube_tracks = []
-                for query in search_queries:
-                    logger.info(f"Trying YouTube search: {query}")
-                    youtube_tracks = YouTubeManager.search_tracks(query, limit=3)
-                    if youtube_tracks:
-                        logger.info(f"Found {len(youtube_tracks)} results for: {query}")
-                        break
-                
-                if not youtube_tracks:
-                    logger.error(f"Could not find YouTube equivalent for: {next_song.title} by {next_song.artist}")
-                    if self.current_channel:
-                        await self.current_channel.send(f"❌ Could not find playable source for: **{next_song.title}**")
-                    await self.play_next()
-                    return
-                
-                # Use the YouTube version
-                youtube_song = youtube_tracks[0]
-                playback_url = youtube_song.url
-                # Update the song object for display
-                next_song.youtube_url = playback_url
-                logger.info(f"Found YouTube equivalent: {youtube_song.title} - {youtube_song.url}")
-            else:
-                # Direct YouTube URL
-                playback_url = next_song.url
+                    await self.current_channel.send(f"⚠️ {failures} tracks in a row failed to play, stopping here. "
+                                                    f"Remaining songs are still queued.")
+                return
+            
+            if not self.voice_client:
+                self.is_playing = False
+                return
             
-            # Extract audio URL
-            audio_url = YouTubeManager.get_audio_url(playback_url)
-            if not audio_url:
-                logger.error(f"Failed to get audio URL for: {next_song.title}")
+            next_song = self.music_queue.get_next()
+            if not next_song:
+                self.is_playing = False
                 if self.current_channel:
-                    await self.current_channel.send(f"❌ Failed to play: **{next_song.title}**")
-                await self.play_next()
+                    await self.current_channel.send("📭 Queue is empty")
                 return
             
-            FFMPEG_OPTIONS = {
-                'before_options': '-reconnect 1 -reconnect_streamed 1 -reconnect_delay_max 5',
-                'options': '-vn -filter:a "volume=0.5"'
-            }
+            self.is_playing = True
             
-            source = discord.FFmpegPCMAudio(audio_url, **FFMPEG_OPTIONS)
+            try:
+                started = await self._start_song(next_song)
+            except Exception as e:
+                logger.error(f"Error playing track: {e}")
+                if self.current_channel:
+                    await self.current_channel.send(f"❌ Error playing: **{next_song.title}**")
+                started = False
             
-            def after_playing(error):
-                if error:
-                    logger.error(f'Player error: {error}')
-                
-                # Schedule next track
-                future = asyncio.run_coroutine_threadsafe(self.play_next(), self.loop)
-                try:
-                    future.result(timeout=5)
-                except Exception as e:
-                    logger.error(f"Error scheduling next track: {e}")
+            if started:
+                break
+            failures += 1
+        
+        # Resolve the upcoming track while this one plays
+        self._start_prefetch()
+        
+        if self.current_channel:
+            embed = discord.Embed(
+                title="🎵 Now Playing",
+                description=f"**{next_song.title}**\n{next_song.artist} • {next_song.duration}",
+                color=0x00ff00
+            )
+            if next_song.source == 'spotify':
+                embed.add_field(name="Source", value="🎵 Spotify → YouTube", inline=True)
+            else:
+                embed.add_field(name="Source", value="🎥 YouTube", inline=True)
+            try:
+                await self.current_channel.send(embed=embed)
+            except discord.HTTPException as e:
+                logger.warning(f"Could not announce track: {e}")
+    
+    @staticmethod
+    def _spotify_queries(song: Song) -> List[str]:
+        """YouTube search variations for a Spotify track, best match first"""
+        return [
+            f"{song.artist} {song.title}",
+            f"{song.title} {song.artist}",
+            f"{song.title}",
+            f"{song.artist} - {song.title}"
+        ]
+    
+    async def _find_youtube_source(self, search_queries: List[str]) -> Optional[Song]:
+        """Find a playable YouTube match for the first query (in priority order) that has one"""
+        if self.http_session:
+            # Search all variants at once over InnerTube, then run a single stream extraction
+            results = await YouTubeManager.search_many_async(self.http_session, search_queries)
+            # Variants usually share a top hit, and failed extractions aren't cached; try each video once
+            tried: Set[str] = set()
+            for query, tracks in zip(search_queries, results):
+                if not tracks or tracks[0].url in tried:
+                    continue
+                tried.add(tracks[0].url)
+                stream_info = await YouTubeManager.get_stream_info_async(tracks[0].url)
+                if stream_info:
+                    logger.info(f"Found YouTube result for: {query}")
+                    # Copy so the cached search result doesn't carry this queue entry's stream
+                    youtube_song = Song.from_dict(tracks[0].to_dict())
+                    youtube_song.stream_url = stream_info['url']
+                    youtube_song.stream_headers = stream_info['http_headers']
+                    return youtube_song
+            if any(results):
+                return None  # Matches exist but none could be extracted; searching again won't help
+        
+        # No HTTP session yet, or no search hits at all: one yt-dlp search + extraction per query
+        for query in search_queries:
+            logger.info(f"Trying YouTube search: {query}")
+            youtube_song = await YouTubeManager.search_and_resolve_async(query)
+            if youtube_song:
+                logger.info(f"Found YouTube result for: {query}")
+                return youtube_song
+        return None
+    
+    async def _start_song(self, next_song: Song) -> bool:
+        """Resolve a song's stream and start playing it, return False if it can't be played"""
+        # Reuse an earlier Spotify -> YouTube match for this track
+        if next_song.source == 'spotify' and not next_song.youtube_url:
+            next_song.youtube_url = await YouTubeManager.get_spotify_match_async(next_song)
+        
+        # Handle Spotify tracks by searching YouTube
+        if next_song.source == 'spotify' and not next_song.youtube_url:
+            if self.current_channel:
+                await self.current_channel.send(f"🔍 Finding YouTube source for: **{next_song.title}** by {next_song.artist}")
+            
+            youtube_song = await self._find_youtube_source(self._spotify_queries(next_song))
             
-            self.voice_client.play(source, after=after_playing)
-            logger.info(f"🎵 Now playing: {next_song.title}")
+            if not youtube_song:
+                logger.error(f"Could not find YouTube equivalent for: {next_song.title} by {next_song.artist}")
+                if self.current_channel:
+                    await self.current_channel.send(f"❌ Could not find playable source for: **{next_song.title}**")
+                return False
             
+            # Use the YouTube version
+            playback_url = youtube_song.url
+            # Update the song object for display
+            next_song.youtube_url = playback_url
+            next_song.stream_url = youtube_song.stream_url
+            next_song.stream_headers = youtube_song.stream_headers
+            await YouTubeManager.set_spotify_match_async(next_song, playback_url)
+            logger.info(f"Found YouTube equivalent: {youtube_song.title} - {youtube_song.url}")
+        else:
+            # Direct YouTube URL (or a Spotify track resolved ahead of time)
+            playback_url = next_song.get_playback_url()
+        
+        # Reuse the stream resolved at search time unless its signature has expired since
+        if next_song.stream_url and not next_song.local_path and YouTubeManager.stream_ttl(next_song.stream_url) <= 0:
+            next_song.stream_url = None
+        if next_song.stream_url:
+            stream_info = {'url': next_song.stream_url, 'http_headers': next_song.stream_headers or {}}
+        else:
+            stream_info = await YouTubeManager.get_stream_info_async(playback_url)
+        if not stream_info:
+            logger.error(f"Failed to get audio URL for: {next_song.title}")
             if self.current_channel:
-                embed = discord.Embed(
-                    title="🎵 Now Playing",
-                    description=f"**{next_song.title}**\n{next_song.artist} • {next_song.duration}",
-                    color=0x00ff00
-                )
-                if next_song.source == 'spotify':
-                    embed.add_field(name="Source", value="🎵 Spotify → YouTube", inline=True)
-                else:
-                    embed.add_field(name="Source", value="🎥 YouTube", inline=True)
-                await self.current_channel.send(embed=embed)
+                await self.current_channel.send(f"❌ Failed to play: **{next_song.title}**")
+            return False
+        
+        if next_song.preloaded_source:
+            # FFmpeg was started on the buffered file while the previous track played
+            source, next_song.preloaded_source = next_song.preloaded_source, None
+        elif next_song.local_path:
+            # Fully buffered ahead of time, no handshake or reconnects needed
+            source = self._make_source(next_song.local_path)
+        else:
+            source = self._make_source(stream_info['url'], stream_info['http_headers'])
+        
+        def after_playing(error):
+            if next_song.local_path:
+                self._discard_buffer(next_song)
+            
+            if error:
+                logger.error(f'Player error: {error}')
+                # The signed stream URL may have expired; re-extract next time
+                YouTubeManager.invalidate_stream(playback_url)
+                next_song.stream_url = None
+            
+            # Hand over to the event loop without blocking the audio player thread
+            try:
+                self.loop.call_soon_threadsafe(self._track_finished)
+            except RuntimeError:
+                pass  # Loop already closed during shutdown, nothing left to play
+        
+        self.voice_client.play(source, after=after_playing)
+        logger.info(f"🎵 Now playing: {next_song.title}")
+        return True
+    
+    @staticmethod
+    def _build_ffmpeg_options(volume: float) -> str:
+        """FFmpeg output options: audio only, with a volume filter only when it changes anything"""
+        # -sn/-dn skip subtitle and data streams so FFmpeg doesn't demux them at all
+        options = '-vn -sn -dn'
+        if float(volume) != 1.0:
+            options += f' -filter:a "volume={volume}"'
+        return options
+    
+    def _make_source(self, location: str, http_headers: Optional[dict] = None) -> discord.FFmpegOpusAudio:
+        """Build an FFmpeg source for a buffered file or a remote stream URL"""
+        before_options = None
+        if location.startswith(('http://', 'https://')):
+            before_options = FFMPEG_RECONNECT_OPTIONS
+            if http_headers:
+                header_lines = ''.join(f"{key}: {value}\r\n" for key, value in http_headers.items())
+                before_options = f"-headers {shlex.quote(header_lines)} {before_options}"
+        # FFmpeg encodes Opus itself, so discord.py doesn't re-encode PCM on the voice thread
+        return discord.FFmpegOpusAudio(location, before_options=before_options, options=self._ffmpeg_options)
+    
+    async def _prefetch_next(self):
+        """Resolve the next queued song's stream ahead of time to avoid a gap between tracks"""
+        song = self.music_queue.peek_next()
+        if not song or song.preloaded_source:
+            return
+        
+        if not song.stream_url:
+            await self._resolve_stream(song)
+        if song.stream_url:
+            await self._buffer_stream(song)
+        if song.local_path and song is self.music_queue.peek_next():
+            self._preload_source(song)
+        elif song.local_path and not self.music_queue.contains(song):
+            # Removed from the queue while it was downloading; nothing else would delete the buffer
+            self._discard_buffer(song)
+    
+    def _preload_source(self, song: Song):
+        """Start FFmpeg on a buffered song so the next track change skips process startup"""
+        # Only one song is preloaded at a time; release one left behind by a shuffle or removal
+        stale = self._preloaded_song
+        if stale and stale is not song and stale.preloaded_source:
+            stale.preloaded_source.cleanup()
+            stale.preloaded_source = None
+            # Removed from the queue: nothing will play its buffer, so don't keep it until shutdown
+            if not self.music_queue.contains(stale):
+                self._discard_buffer(stale)
+        
+        try:
+            song.preloaded_source = self._make_source(song.local_path)
+            self._preloaded_song = song
+        except discord.ClientException as e:
+            logger.warning(f"Could not preload {song.title}: {e}")
+    
+    async def _resolve_stream(self, song: Song):
+        """Resolve a queued song's YouTube stream URL ahead of playback"""
+        try:
+            if song.source == 'spotify' and not song.youtube_url:
+                song.youtube_url = await YouTubeManager.get_spotify_match_async(song)
             
+            if song.source == 'spotify' and not song.youtube_url:
+                # Same lookups as _start_song, so a track change mid-prefetch joins them instead of starting over
+                youtube_song = await self._find_youtube_source(self._spotify_queries(song))
+                if not youtube_song:
+                    return
+                song.youtube_url = youtube_song.url
+                song.stream_url = youtube_song.stream_url
+                song.stream_headers = youtube_song.stream_headers
+                await YouTubeManager.set_spotify_match_async(song, youtube_song.url)
+            else:
+                stream_info = await YouTubeManager.get_stream_info_async(song.get_playback_url())
+                if not stream_info:
+                    return
+                song.stream_url = stream_info['url']
+                song.stream_headers = stream_info['http_headers']
+            logger.info(f"Prefetched stream for: {song.title}")
         except Exception as e:
-            logger.error(f"Error playing track: {e}")
-            if self.current_channel:
-                await self.current_channel.send(f"❌ Error playing: **{next_song.title}**")
-            await self.play_next()
+            logger.warning(f"Prefetch failed for {song.title}: {e}")
+    
+    async def _buffer_stream(self, song: Song):
+        """Download a resolved stream to a local file so playback doesn't depend on the network"""
+        if not self.http_session or not self._prefetch_dir or song.local_path:
+            return
+        
+        max_bytes = self._prefetch_max_bytes
+        fd, path = tempfile.mkstemp(suffix='.audio', dir=self._prefetch_dir)
+        complete = False
+        try:
+            async with self.http_session.get(song.stream_url, headers=song.stream_headers or {}) as response:
+                response.raise_for_status()
+                if (response.content_length or 0) > max_bytes:
+                    logger.info(f"Not buffering {song.title}: stream is larger than {max_bytes} bytes")
+                    return
+                
+                written = 0
+                with os.fdopen(fd, 'wb') as f:
+                    fd = None
+                    async for chunk in response.content.iter_chunked(256 * 1024):
+                        written += len(chunk)
+                        if written > max_bytes:
+                            logger.info(f"Not buffering {song.title}: stream is larger than {max_bytes} bytes")
+                            return
+                        # Disk writes can stall on a slow volume; keep them off the event loop
+                        await asyncio.to_thread(f.write, chunk)
+            
+            song.local_path = path
+            complete = True
+            logger.info(f"Buffered {written} bytes for: {song.title}")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"Buffering failed for {song.title}, will stream instead: {e}")
+        finally:
+            if fd is not None:
+                os.close(fd)
+            if not complete:
+                self._remove_file(path)
+    
+    def _discard_buffer(self, song: Song):
+        """Delete a song's local buffer once it has been played"""
+        path, song.local_path = song.local_path, None
+        if path:
+            self._remove_file(path)
+    
+    @staticmethod
+    def _remove_file(path: str):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
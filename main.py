@@ -4,12 +4,15 @@ Psychosonus - Discord Music Bot
 Main entry point
 """
 
+import asyncio
 import logging
+import sys
 import threading
 
 from config import Config
 from discord_bot import MusicBot
 from web_interface import WebInterface
+from youtube_manager import DEFAULT_YTDLP_CONCURRENCY, ensure_cache_dir, set_ytdlp_concurrency
 
 # Configure logging
 logging.basicConfig(
@@ -18,11 +21,34 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Optional faster event loop
+try:
+    import uvloop
+    UVLOOP_AVAILABLE = True
+except ImportError:
+    UVLOOP_AVAILABLE = False
+
+async def run_bot(bot: MusicBot, token: str, eager_tasks: bool = False):
+    """Log the bot in and run it until it is closed"""
+    if eager_tasks and sys.version_info >= (3, 12):
+        # Tasks that finish without suspending (cache hits, no-op hand-offs) skip a trip through the scheduler
+        asyncio.get_running_loop().set_task_factory(asyncio.eager_task_factory)
+    async with bot:
+        await bot.start(token)
+
 def main():
     """Main function"""
     try:
         # Load configuration
-        config = Config()
+        try:
+            config = Config()
+        except (FileNotFoundError, ValueError) as e:
+            logger.error(f"❌ config.json: {e}")
+            sys.exit(1)
+        
+        # Prepare yt-dlp's persistent cache and limit concurrent extractions
+        ensure_cache_dir()
+        set_ytdlp_concurrency(config.get('yt_concurrency', DEFAULT_YTDLP_CONCURRENCY))
         
         # Create bot instance
         bot = MusicBot(config)
@@ -35,7 +61,18 @@ def main():
         flask_thread.start()
         
         # Start Discord bot
-        bot.run(config.get('discord_token'))
+        token = config.get('discord_token')
+        eager_tasks = config.get('eager_tasks', False)
+        if UVLOOP_AVAILABLE and config.get('use_uvloop', True):
+            logger.info("Using uvloop event loop")
+            if sys.version_info >= (3, 12):
+                # Hand asyncio.run the loop directly; event loop policies are deprecated from 3.14
+                asyncio.run(run_bot(bot, token, eager_tasks), loop_factory=uvloop.new_event_loop)
+            else:
+                asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+                asyncio.run(run_bot(bot, token, eager_tasks))
+        else:
+            asyncio.run(run_bot(bot, token, eager_tasks))
         
     except KeyboardInterrupt:
         logger.info("Bot stopped by user")
@@ -3,13 +3,46 @@
 Data models for Psychosonus
 """
 
-from typing import Dict, Any, Optional
+import json
+import unicodedata
+from typing import Dict, Any, List, Optional
+
+# Display limits for song metadata, in characters
+TITLE_MAX_LENGTH = 100
+ARTIST_MAX_LENGTH = 50
+
+ZERO_WIDTH_JOINER = '\u200d'
+VARIATION_SELECTORS = frozenset('\ufe0e\ufe0f')  # Text / emoji presentation
+
+def _attaches_to_previous(char: str) -> bool:
+    """Whether a character only makes sense together with the one before it"""
+    return (bool(unicodedata.combining(char)) or char == ZERO_WIDTH_JOINER or char in VARIATION_SELECTORS
+            or '\U0001f3fb' <= char <= '\U0001f3ff')  # Emoji skin tone modifiers
+
+def clip_text(text: str, limit: int) -> str:
+    """Shorten text to at most limit characters without splitting an accented letter or emoji sequence"""
+    if len(text) <= limit:
+        return text
+    end = limit
+    # Back off while the cut would separate a character from what attaches to it, or end on a joiner
+    while end > 0 and (_attaches_to_previous(text[end]) or text[end - 1] == ZERO_WIDTH_JOINER):
+        end -= 1
+    # Text that is one long sequence has no safe cut; a hard cut beats returning nothing
+    return text[:end].rstrip() or text[:limit]
 
 class Song:
     """Song data structure"""
     
+    # Fixed attribute layout instead of a per-instance __dict__
+    __slots__ = ('id', 'title', 'artist', 'duration', 'url', 'source', 'youtube_url',
+                 'stream_url', 'stream_headers', 'local_path', 'preloaded_source', '_dict_cache')
+    
+    # Fields included in to_dict(); assigning one of them drops the cached dict
+    _SERIALIZED_FIELDS = frozenset(('id', 'title', 'artist', 'duration', 'url', 'source', 'youtube_url'))
+    
     def __init__(self, id: str, title: str, artist: str, duration: str, url: str, 
                  source: str = 'youtube', youtube_url: Optional[str] = None):
+        self._dict_cache: Optional[Dict[str, Any]] = None
         self.id = id
         self.title = title
         self.artist = artist
@@ -17,18 +50,30 @@ class Song:
         self.url = url  # Original URL (Spotify or YouTube)
         self.source = source  # 'spotify' or 'youtube'
         self.youtube_url = youtube_url  # YouTube URL for playback if source is Spotify
+        # Resolved stream data (runtime only, not serialized)
+        self.stream_url: Optional[str] = None
+        self.stream_headers: Optional[Dict[str, str]] = None
+        self.local_path: Optional[str] = None  # Prefetched copy of the stream on disk
+        self.preloaded_source = None  # FFmpeg source already started on local_path
+    
+    def __setattr__(self, name: str, value: Any):
+        super().__setattr__(name, value)
+        if name in self._SERIALIZED_FIELDS:
+            super().__setattr__('_dict_cache', None)
     
     def to_dict(self) -> Dict[str, Any]:
-        """Convert to dictionary for JSON serialization"""
-        return {
-            'id': self.id,
-            'title': self.title,
-            'artist': self.artist,
-            'duration': self.duration,
-            'url': self.url,
-            'source': self.source,
-            'youtube_url': self.youtube_url
-        }
+        """Convert to dictionary for JSON serialization (cached, do not modify the result)"""
+        if self._dict_cache is None:
+            self._dict_cache = {
+                'id': self.id,
+                'title': self.title,
+                'artist': self.artist,
+                'duration': self.duration,
+                'url': self.url,
+                'source': self.source,
+                'youtube_url': self.youtube_url
+            }
+        return self._dict_cache
     
     @classmethod
     def from_dict(cls, data: Dict[str, Any]) -> 'Song':
@@ -47,4 +92,12 @@ class Song:
         """Get the URL to use for playback"""
         if self.source == 'spotify' and self.youtube_url:
             return self.youtube_url
-        return self.url
\ No newline at end of file
+        return self.url
+
+def dump_songs(songs: List[Song]) -> bytes:
+    """Serialize a list of songs for the persistent cache"""
+    return json.dumps([song.to_dict() for song in songs]).encode()
+
+def load_songs(payload: bytes) -> List[Song]:
+    """Rebuild a list of songs saved by dump_songs"""
+    return [Song.from_dict(data) for data in json.loads(payload)]
@@ -3,20 +3,38 @@
 Thread-safe music queue manager for Psychosonus
 """
 
+import random
 import threading
 from collections import deque
-from typing import List, Dict, Any, Optional
+from typing import Deque, List, Dict, Any, Optional, Tuple
 
 from models import Song
 
+# (version, current track dict or None, upcoming song dicts)
+QueueSnapshot = Tuple[int, Optional[Dict[str, Any]], List[Dict[str, Any]]]
+
 class MusicQueue:
     """Thread-safe music queue manager"""
     
     def __init__(self, max_size: int = 100):
-        self.queue = deque()
+        self.queue: Deque[Song] = deque()
         self.current_track: Optional[Song] = None
         self.max_size = max_size
+        self.version = 0  # Bumped on every change so listeners can detect updates
         self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._snapshot: Optional[QueueSnapshot] = None
+    
+    def _touch(self):
+        """Record a change and wake up listeners (caller must hold the lock)"""
+        self.version += 1
+        self._changed.notify_all()
+    
+    def wait_for_change(self, version: int, timeout: Optional[float] = None) -> int:
+        """Block until the queue version differs from version (or timeout), return current version"""
+        with self._changed:
+            self._changed.wait_for(lambda: self.version != version, timeout)
+            return self.version
     
     def add_song(self, song: Song) -> bool:
         """Add song to queue"""
@@ -24,6 +42,7 @@ class MusicQueue:
             if len(self.queue) >= self.max_size:
                 return False
             self.queue.append(song)
+            self._touch()
             return True
     
     def get_next(self) -> Optional[Song]:
@@ -31,6 +50,7 @@ class MusicQueue:
         with self._lock:
             if self.queue:
                 self.current_track = self.queue.popleft()
+                self._touch()
                 return self.current_track
             return None
     
@@ -38,9 +58,9 @@ class MusicQueue:
         """Remove song at specific index (0-based, excluding current track)"""
         with self._lock:
             if 0 <= index < len(self.queue):
-                queue_list = list(self.queue)
-                queue_list.pop(index)
-                self.queue = deque(queue_list)
+                # deque deletes by rotating the shorter way to the index, no copy of the queue
+                del self.queue[index]
+                self._touch()
                 return True
             return False
     
@@ -48,26 +68,61 @@ class MusicQueue:
         """Clear the entire queue"""
         with self._lock:
             self.queue.clear()
+            self._touch()
     
-    def get_queue_list(self) -> List[Dict[str, Any]]:
-        """Get current queue as list including current track"""
+    def clear_current(self):
+        """Forget the current track (e.g. after playback is stopped)"""
         with self._lock:
-            queue_list = []
-            if self.current_track:
-                queue_list.append({
-                    'song': self.current_track.to_dict(),
-                    'current': True
-                })
-            
-            for song in self.queue:
-                queue_list.append({
-                    'song': song.to_dict(),
-                    'current': False
-                })
-            
-            return queue_list
+            self.current_track = None
+            self._touch()
+    
+    def shuffle(self):
+        """Shuffle the queue"""
+        with self._lock:
+            songs = list(self.queue)
+            random.shuffle(songs)
+            # Swap in a new deque so lock-free readers never see a half-built queue
+            self.queue = deque(songs)
+            self._touch()
+    
+    def get_snapshot(self) -> QueueSnapshot:
+        """Get the current track and upcoming songs as dicts, with the version they were built from (shared, do not modify)"""
+        # Fast path without the lock: both are single attribute loads, and a snapshot only
+        # matches while nothing has changed since it was built
+        snapshot = self._snapshot
+        if snapshot and snapshot[0] == self.version:
+            return snapshot
+        
+        # Only copy references under the lock; building the dicts happens outside it
+        with self._lock:
+            version = self.version
+            current_track = self.current_track
+            songs = list(self.queue)
+        
+        # Cached to_dict() references only, no wrapper dict per entry
+        current = current_track.to_dict() if current_track else None
+        upcoming = [song.to_dict() for song in songs]
+        
+        snapshot = (version, current, upcoming)
+        with self._lock:
+            if self.version == version:
+                self._snapshot = snapshot
+        return snapshot
+    
+    def peek_next(self) -> Optional[Song]:
+        """Get the next song without removing it from the queue"""
+        # A single deque read is atomic under the GIL, no lock needed
+        queue = self.queue
+        try:
+            return queue[0]
+        except IndexError:
+            return None
+    
+    def contains(self, song: Song) -> bool:
+        """Check whether this exact song object is still waiting in the queue"""
+        with self._lock:
+            return any(queued is song for queued in self.queue)
     
     def size(self) -> int:
         """Get queue size (excluding current track)"""
-        with self._lock:
-            return len(self.queue)
\ No newline at end of file
+        return len(self.queue)
\ No newline at end of file
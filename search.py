@@ -4,17 +4,38 @@ Search module for Psychosonus - Spotify Integration
 Handles music search and metadata extraction
 """
 
+import asyncio
+import json
 import logging
 import requests
 import base64
 import time
 from typing import Dict, List, Optional, Any
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
-from models import Song
+from cache import SingleFlight, SQLiteStore, TTLCache, search_key
+from models import ARTIST_MAX_LENGTH, TITLE_MAX_LENGTH, Song, clip_text, dump_songs, load_songs
 from youtube_manager import YouTubeManager
 
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
+
 logger = logging.getLogger(__name__)
 
+SEARCH_CACHE_TTL = 86400  # 24 hours, Spotify catalog search results rarely change
+
+# Shared HTTP session so Spotify calls reuse pooled keep-alive connections
+HTTP = requests.Session()
+HTTP.mount('https://', HTTPAdapter(
+    pool_connections=20,
+    pool_maxsize=100,
+    max_retries=Retry(total=2, backoff_factor=0.2)
+))
+
 
 class SpotifyManager:
     """Spotify API integration for music search"""
@@ -25,6 +46,8 @@ class SpotifyManager:
         self.config = config
         self.access_token = None
         self.token_expires_at = 0
+        self._search_cache = TTLCache(maxsize=2048, ttl=SEARCH_CACHE_TTL, store=SQLiteStore('spotify_search'),
+                                      dumps=dump_songs, loads=load_songs)
         
     def _get_access_token(self) -> bool:
         """Get Spotify access token using client credentials flow"""
@@ -39,7 +62,7 @@ class SpotifyManager:
             
             data = {'grant_type': 'client_credentials'}
             
-            response = requests.post(
+            response = HTTP.post(
                 'https://accounts.spotify.com/api/token',
                 headers=headers,
                 data=data,
@@ -47,7 +70,7 @@ class SpotifyManager:
             )
             
             if response.status_code == 200:
-                token_data = response.json()
+                token_data = _json_loads(response.content)
                 self.access_token = token_data['access_token']
                 self.token_expires_at = time.time() + token_data['expires_in'] - 60
                 logger.info("Successfully obtained Spotify access token")
@@ -75,6 +98,12 @@ class SpotifyManager:
     
     def search_tracks(self, query: str, limit: int = 5) -> List[Song]:
         """Search for tracks on Spotify"""
+        cache_key = search_key(query, limit)
+        cached = self._search_cache.get(cache_key)
+        if cached:
+            logger.info(f"Spotify search cache hit for: {query}")
+            return list(cached)
+        
         if not self._ensure_valid_token():
             logger.error("Failed to get valid Spotify token")
             return []
@@ -92,7 +121,7 @@ class SpotifyManager:
                 'market': 'US'
             }
             
-            response = requests.get(
+            response = HTTP.get(
                 'https://api.spotify.com/v1/search',
                 headers=headers,
                 params=params,
@@ -100,7 +129,7 @@ class SpotifyManager:
             )
             
             if response.status_code == 200:
-                data = response.json()
+                data = _json_loads(response.content)
                 tracks = []
                 
                 for track in data.get('tracks', {}).get('items', []):
@@ -114,8 +143,8 @@ class SpotifyManager:
                     
                     song = Song(
                         id=track['id'],
-                        title=track.get('name', 'Unknown Title')[:100],
-                        artist=artist_str[:50],
+                        title=clip_text(track.get('name', 'Unknown Title'), TITLE_MAX_LENGTH),
+                        artist=clip_text(artist_str, ARTIST_MAX_LENGTH),
                         duration=duration_str,
                         url=track.get('external_urls', {}).get('spotify', ''),
                         source='spotify'
@@ -123,7 +152,10 @@ class SpotifyManager:
                     tracks.append(song)
                 
                 logger.info(f"Found {len(tracks)} tracks for query: {query}")
-                return tracks
+                # Only cache successful searches so transient failures are retried
+                if tracks:
+                    self._search_cache.set(cache_key, tracks)
+                return list(tracks)
             
             elif response.status_code == 401:
                 logger.warning("Spotify token expired, refreshing...")
@@ -151,14 +183,14 @@ class SpotifyManager:
                 'Content-Type': 'application/json'
             }
             
-            response = requests.get(
+            response = HTTP.get(
                 f'https://api.spotify.com/v1/tracks/{track_id}',
                 headers=headers,
                 timeout=10
             )
             
             if response.status_code == 200:
-                track = response.json()
+                track = _json_loads(response.content)
                 
                 duration_ms = track.get('duration_ms', 0)
                 minutes = duration_ms // 60000
@@ -193,6 +225,7 @@ class SearchManager:
         self.config_obj = config_obj
         self.spotify = None
         self.youtube = YouTubeManager()
+        self._inflight = SingleFlight()  # Catalog searches currently running on the bot loop
         
         spotify_client_id = config_data.get('spotify_client_id')
         spotify_client_secret = config_data.get('spotify_client_secret')
@@ -220,6 +253,14 @@ class SearchManager:
             logger.error("No search services available")
             return []
     
+    async def search_tracks_async(self, query: str, limit: int = 5) -> List[Song]:
+        """Run search_tracks off the event loop, sharing one lookup between identical concurrent searches"""
+        tracks = await self._inflight.run(
+            search_key(query, limit),
+            lambda: asyncio.to_thread(self.search_tracks, query, limit)
+        )
+        return list(tracks)
+    
     def get_audio_url(self, song: Song) -> Optional[str]:
         """Get the audio URL for a song, searching YouTube if needed"""
         if 'youtube' in song.url:
@@ -4,6 +4,8 @@ const API_URL = '/api';
 // State management
 let isSearching = false;
 let lastQueueUpdate = 0;
+let queueVersion = null;
+let queueStreaming = false;
 let lastStatusUpdate = 0;
 let trackStartTime = 0;
 let trackDuration = 0;
@@ -176,17 +178,6 @@ function setupEventListeners() {
     }
 }
 
-function startPolling() {
-    // Initial fetch
-    fetchStatus();
-    fetchQueue();
-    
-    // Set up polling intervals
-    setInterval(fetchStatus, 3000);   // Poll status every 3 seconds
-    setInterval(fetchQueue, 5000);    // Poll queue every 5 seconds
-    setInterval(updateProgress, 1000); // Update progress every second
-}
-
 // Status Management
 async function fetchStatus() {
     try {
@@ -205,6 +196,11 @@ async function fetchStatus() {
             lastStatusUpdate = Date.now();
             userHasAccess = data.user_has_access;
             updateControlsAccess();
+            
+            // Without the push stream, only refetch the queue when the server says it changed
+            if (!queueStreaming && data.queue_version !== queueVersion) {
+                fetchQueue();
+            }
         } else {
             showMessage('error', `Status error: ${data.error}`, 'queueMessage');
         }
@@ -409,13 +405,25 @@ async function handleSearch() {
             return;
         }
         
-        const data = await response.json();
+        const contentType = response.headers.get('Content-Type') || '';
+        if (!contentType.includes('application/x-ndjson')) {
+            const data = await response.json();
+            showMessage('error', `Search error: ${data.error}`, 'searchMessage');
+            return;
+        }
         
-        if (data.success) {
-            displaySearchResults(data.results);
-            showMessage('success', `Found ${data.results.length} results`, 'searchMessage');
+        // Each line holds one source's results; render them as soon as they arrive
+        let count = 0;
+        await readNdjson(response, batch => {
+            appendSearchResults(batch.results);
+            count += batch.results.length;
+            showMessage('info', `Found ${count} results, still searching...`, 'searchMessage');
+        });
+        
+        if (count > 0) {
+            showMessage('success', `Found ${count} results`, 'searchMessage');
         } else {
-            showMessage('error', `Search error: ${data.error}`, 'searchMessage');
+            showMessage('error', 'No results found', 'searchMessage');
         }
     } catch (error) {
         console.error('Search request failed:', error);
@@ -429,37 +437,62 @@ async function handleSearch() {
     }
 }
 
-function displaySearchResults(results) {
+async function readNdjson(response, onItem) {
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    
+    while (true) {
+        const { done, value } = await reader.read();
+        buffer += decoder.decode(value || new Uint8Array(), { stream: !done });
+        
+        const lines = buffer.split('\n');
+        buffer = lines.pop();
+        lines.filter(line => line.trim()).forEach(line => onItem(JSON.parse(line)));
+        
+        if (done) break;
+    }
+    
+    if (buffer.trim()) {
+        onItem(JSON.parse(buffer));
+    }
+}
+
+function appendSearchResults(results) {
     if (!elements.searchResults) return;
     
-    elements.searchResults.innerHTML = '';
+    const fragment = document.createDocumentFragment();
     
     results.forEach(track => {
         const li = document.createElement('li');
         li.className = 'search-result-item';
         
-        const sourceIcon = track.source === 'spotify' ? '🎵' : '🎥';
-        
-        li.innerHTML = `
-            <span class="search-result-source">${sourceIcon}</span>
-            <div class="search-result-info">
-                <div class="search-result-title">${escapeHtml(track.title)}</div>
-                <div class="search-result-artist">${escapeHtml(track.artist)}</div>
-                <div class="search-result-duration">${escapeHtml(track.duration)}</div>
-            </div>
-            <button class="add-btn" data-song='${JSON.stringify(track)}' ${!userHasAccess ? 'disabled' : ''}>Add</button>
-        `;
-        
-        const addButton = li.querySelector('.add-btn');
+        const source = document.createElement('span');
+        source.className = 'search-result-source';
+        source.textContent = track.source === 'spotify' ? '🎵' : '🎥';
+        
+        const info = document.createElement('div');
+        info.className = 'search-result-info';
+        info.append(
+            createTextElement('div', 'search-result-title', track.title),
+            createTextElement('div', 'search-result-artist', track.artist),
+            createTextElement('div', 'search-result-duration', track.duration)
+        );
+        
+        const addButton = document.createElement('button');
+        addButton.className = 'add-btn';
+        addButton.textContent = 'Add';
+        addButton.disabled = !userHasAccess;
         if (userHasAccess) {
-            addButton.addEventListener('click', (e) => {
-                const songData = JSON.parse(e.target.getAttribute('data-song'));
-                handleAddToQueue(songData, e.target);
-            });
+            // The closure keeps the track object, no need to round-trip it through an attribute
+            addButton.addEventListener('click', () => handleAddToQueue(track, addButton));
         }
         
-        elements.searchResults.appendChild(li);
+        li.append(source, info, addButton);
+        fragment.appendChild(li);
     });
+    
+    elements.searchResults.appendChild(fragment);
 }
 
 function clearSearchResults() {
@@ -481,7 +514,8 @@ async function fetchQueue() {
         const data = await response.json();
         
         if (data.success) {
-            displayQueue(data.queue);
+            displayQueue(data.current, data.upcoming);
+            queueVersion = data.version;
             lastQueueUpdate = Date.now();
         } else {
             console.error('Queue fetch error:', data.error);
@@ -491,12 +525,39 @@ async function fetchQueue() {
     }
 }
 
-function displayQueue(queue) {
+function startQueueStream() {
+    if (!window.EventSource) {
+        // No SSE support, fall back to status polling (see fetchStatus)
+        fetchQueue();
+        return;
+    }
+    
+    const source = new EventSource(`${API_URL}/queue/stream`);
+    queueStreaming = true;
+    
+    source.onmessage = (event) => {
+        const data = JSON.parse(event.data);
+        if (data.success) {
+            displayQueue(data.current, data.upcoming);
+            queueVersion = data.version;
+            lastQueueUpdate = Date.now();
+        }
+    };
+    
+    source.onerror = () => {
+        if (source.readyState === EventSource.CLOSED) {
+            console.warn('Queue stream closed, falling back to polling');
+            queueStreaming = false;
+        }
+    };
+}
+
+function displayQueue(current, upcoming) {
     if (!elements.queueList) return;
     
     elements.queueList.innerHTML = '';
     
-    if (queue.length === 0) {
+    if (!current && upcoming.length === 0) {
         const li = document.createElement('li');
         li.className = 'queue-item';
         li.innerHTML = '<div class="queue-item-info">Queue is empty</div>';
@@ -504,29 +565,19 @@ function displayQueue(queue) {
         return;
     }
     
-    queue.forEach((item, index) => {
-        const li = document.createElement('li');
-        li.className = `queue-item ${item.current ? 'current' : ''}`;
-        
-        const song = item.song;
-        const sourceIcon = song.source === 'spotify' ? '🎵' : '🎥';
-        const prefix = item.current ? '▶️ ' : `${index}. `;
-        
-        li.innerHTML = `
-            <span class="queue-result-source">${sourceIcon}</span>
-            <div class="queue-item-info">
-                <div class="queue-item-title">${prefix}${escapeHtml(song.title)}</div>
-                <div class="queue-item-artist">${escapeHtml(song.artist)} • ${escapeHtml(song.duration)}</div>
-            </div>
-        `;
+    if (current) {
+        elements.queueList.appendChild(createQueueItem(current, '▶️ ', true));
+    }
+    
+    upcoming.forEach((song, index) => {
+        const li = createQueueItem(song, `${index + 1}. `, false);
         
-        if (!item.current && userHasAccess) {
+        if (userHasAccess) {
             const removeButton = document.createElement('button');
             removeButton.className = 'queue-item-remove';
             removeButton.textContent = 'Remove';
             removeButton.addEventListener('click', () => {
-                const queueIndex = index - queue.filter(q => q.current).length;
-                handleRemoveFromQueue(queueIndex, removeButton);
+                handleRemoveFromQueue(index, removeButton);
             });
             li.appendChild(removeButton);
         }
@@ -535,6 +586,23 @@ function displayQueue(queue) {
     });
 }
 
+function createQueueItem(song, prefix, isCurrent) {
+    const li = document.createElement('li');
+    li.className = `queue-item ${isCurrent ? 'current' : ''}`;
+    
+    const sourceIcon = song.source === 'spotify' ? '🎵' : '🎥';
+    
+    li.innerHTML = `
+        <span class="queue-result-source">${sourceIcon}</span>
+        <div class="queue-item-info">
+            <div class="queue-item-title">${prefix}${escapeHtml(song.title)}</div>
+            <div class="queue-item-artist">${escapeHtml(song.artist)} • ${escapeHtml(song.duration)}</div>
+        </div>
+    `;
+    
+    return li;
+}
+
 async function handleAddToQueue(song, button) {
     if (!userHasAccess) return;
     
@@ -852,6 +920,13 @@ function showMessage(type, text, elementId) {
     }, 5000);
 }
 
+function createTextElement(tag, className, text) {
+    const element = document.createElement(tag);
+    element.className = className;
+    element.textContent = text;
+    return element;
+}
+
 function escapeHtml(text) {
     const div = document.createElement('div');
     div.textContent = text;
@@ -886,13 +961,14 @@ function stopConnectionMonitoring() {
 function startPolling() {
     // Initial fetch
     fetchStatus();
-    fetchQueue();
     
     // Set up polling intervals
     setInterval(fetchStatus, 3000);   // Poll status every 3 seconds
-    setInterval(fetchQueue, 5000);    // Poll queue every 5 seconds
     setInterval(updateProgress, 1000); // Update progress every second
     
+    // Queue updates are pushed by the server
+    startQueueStream();
+    
     // Start connection monitoring
     startConnectionMonitoring();
 }
@@ -4,10 +4,15 @@ Flask web interface for Psychosonus with Discord OAuth2
 """
 
 import asyncio
+import concurrent.futures
+import json
 import logging
 import secrets
+import threading
 from functools import wraps
-from flask import Flask, jsonify, request, send_from_directory, redirect, session, url_for, render_template_string
+from typing import Tuple
+from flask import Flask, Response, jsonify, request, send_from_directory, redirect, session, url_for
+from flask.json.provider import JSONProvider
 
 from config import Config
 from models import Song
@@ -24,6 +29,120 @@ except ImportError:
     logger.warning("Spotify search not available - using YouTube only")
     SPOTIFY_AVAILABLE = False
 
+MAX_BULK_QUERIES = 25  # Cap for a single bulk /api/search request
+SEARCH_RESULTS_PER_SOURCE = 5  # Each source gets its own share so the mix doesn't depend on which answers first
+
+AUTH_PAGE_HTML = """
+<!DOCTYPE html>
+<html>
+<head>
+    <title>Psychosonus - Discord Authorization</title>
+    <style>
+        body { 
+            font-family: 'Consolas', monospace; 
+            background: #000; 
+            color: #fff; 
+            text-align: center; 
+            padding: 50px;
+        }
+        .auth-container {
+            max-width: 500px;
+            margin: 0 auto;
+            padding: 40px;
+            background: #111;
+            border: 2px solid #333;
+            border-radius: 10px;
+        }
+        .title { 
+            font-size: 3rem; 
+            color: #fff;
+            text-shadow: 0 0 10px rgba(255, 0, 0, 0.8);
+            margin-bottom: 20px;
+        }
+        .subtitle { 
+            color: #aaa; 
+            margin-bottom: 30px; 
+        }
+        .discord-btn {
+            background: #5865F2;
+            color: white;
+            padding: 15px 30px;
+            border: none;
+            border-radius: 8px;
+            font-size: 18px;
+            text-decoration: none;
+            display: inline-block;
+            margin: 20px 0;
+            transition: background 0.3s;
+        }
+        .discord-btn:hover { background: #4752C4; }
+        .info { color: #888; font-size: 14px; margin-top: 20px; }
+    </style>
+</head>
+<body>
+    <div class="auth-container">
+        <h1 class="title">🎵 Psychosonus</h1>
+        <p class="subtitle">Discord Music Bot Dashboard</p>
+        <p>Sign in with your Discord account to access the web dashboard.</p>
+        <a href="{{ auth_url }}" class="discord-btn">
+            🔗 Authorize with Discord
+        </a>
+        <div class="info">
+            <p>You need to be a member of a server where Psychosonus is installed.</p>
+            <p>Only server members can control the bot's queue.</p>
+        </div>
+    </div>
+</body>
+</html>
+"""
+
+NO_ACCESS_HTML = """
+<h1>No Access</h1>
+<p>Please join a server where the bot is added.</p>
+<p>Current bot servers: {{ bot_guilds }}</p>
+<a href="/auth">Try again</a>
+"""
+
+# Use a production WSGI server if available
+try:
+    import waitress
+    WAITRESS_AVAILABLE = True
+except ImportError:
+    WAITRESS_AVAILABLE = False
+
+# Use orjson for API responses if available
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+class OrjsonProvider(JSONProvider):
+    """Flask JSON provider backed by orjson"""
+    
+    def dumps(self, obj, **kwargs) -> str:
+        return orjson.dumps(obj).decode()
+    
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+    
+    def response(self, *args, **kwargs):
+        """Build a JSON response straight from orjson bytes"""
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(orjson.dumps(obj), mimetype='application/json')
+
+def _json_default(obj):
+    """Serialize Song objects in place, without building a list of dicts first"""
+    if isinstance(obj, Song):
+        return obj.to_dict()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+def dumps_bytes(obj) -> bytes:
+    """Serialize to UTF-8 JSON bytes, skipping the str round-trip when orjson is available"""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(obj, default=_json_default)
+    return json.dumps(obj, separators=(',', ':'), default=_json_default).encode()
+
 class WebInterface:
     def setup_routes(self):
         """Setup Flask routes"""
@@ -49,6 +168,8 @@ class WebInterface:
         self.bot = bot
         self.config = config
         self.app = Flask(__name__)
+        if ORJSON_AVAILABLE:
+            self.app.json = OrjsonProvider(self.app)
         
         # Set up session secret
         self.app.secret_key = config.get('session_secret', secrets.token_hex(32))
@@ -60,6 +181,10 @@ class WebInterface:
             redirect_uri=config.get('redirect_uri')  # Port-less URI from config
         )
         
+        # Compile page templates once instead of on every request
+        self._auth_page_template = self.app.jinja_env.from_string(AUTH_PAGE_HTML)
+        self._no_access_template = self.app.jinja_env.from_string(NO_ACCESS_HTML)
+        
         # Initialize server permissions
         self.server_permissions = ServerPermissions(bot)
         
@@ -69,6 +194,15 @@ class WebInterface:
         else:
             self.search_manager = None
         
+        # Serialized /api/queue payload, shared by pollers until the queue changes
+        self._queue_payload_cache = None
+        # Queue versions restart at 0 with the process, so ETags carry a per-run prefix
+        self._etag_prefix = secrets.token_hex(4)
+        
+        # Each SSE subscriber holds a server thread for as long as it is connected,
+        # so cap them below the pool size to leave threads for regular requests
+        self._stream_slots = threading.BoundedSemaphore(max(1, config.get('web_threads', 8) // 2))
+        
         self.setup_routes()
     
     def require_auth(self, f):
@@ -98,6 +232,20 @@ class WebInterface:
             return f(*args, **kwargs)
         return decorated_function
     
+    def _queue_payload(self) -> Tuple[int, bytes]:
+        """Serialized queue response and its version, rebuilt only when the queue version changes"""
+        version, current, upcoming = self.bot.music_queue.get_snapshot()
+        cached = self._queue_payload_cache
+        if cached and cached[0] == version:
+            return cached
+        payload = dumps_bytes({'success': True, 'version': version, 'current': current, 'upcoming': upcoming})
+        self._queue_payload_cache = (version, payload)
+        return version, payload
+    
+    def _queue_etag(self, version: int) -> str:
+        """ETag for a queue version"""
+        return f"{self._etag_prefix}-{version}"
+    
     def setup_routes(self):
         """Setup Flask routes"""
         
@@ -113,70 +261,7 @@ class WebInterface:
             """Discord OAuth2 authorization page"""
             auth_url = self.discord_auth.get_authorization_url()
             
-            auth_page_html = """
-            <!DOCTYPE html>
-            <html>
-            <head>
-                <title>Psychosonus - Discord Authorization</title>
-                <style>
-                    body { 
-                        font-family: 'Consolas', monospace; 
-                        background: #000; 
-                        color: #fff; 
-                        text-align: center; 
-                        padding: 50px;
-                    }
-                    .auth-container {
-                        max-width: 500px;
-                        margin: 0 auto;
-                        padding: 40px;
-                        background: #111;
-                        border: 2px solid #333;
-                        border-radius: 10px;
-                    }
-                    .title { 
-                        font-size: 3rem; 
-                        color: #fff;
-                        text-shadow: 0 0 10px rgba(255, 0, 0, 0.8);
-                        margin-bottom: 20px;
-                    }
-                    .subtitle { 
-                        color: #aaa; 
-                        margin-bottom: 30px; 
-                    }
-                    .discord-btn {
-                        background: #5865F2;
-                        color: white;
-                        padding: 15px 30px;
-                        border: none;
-                        border-radius: 8px;
-                        font-size: 18px;
-                        text-decoration: none;
-                        display: inline-block;
-                        margin: 20px 0;
-                        transition: background 0.3s;
-                    }
-                    .discord-btn:hover { background: #4752C4; }
-                    .info { color: #888; font-size: 14px; margin-top: 20px; }
-                </style>
-            </head>
-            <body>
-                <div class="auth-container">
-                    <h1 class="title">🎵 Psychosonus</h1>
-                    <p class="subtitle">Discord Music Bot Dashboard</p>
-                    <p>Sign in with your Discord account to access the web dashboard.</p>
-                    <a href="{{ auth_url }}" class="discord-btn">
-                        🔗 Authorize with Discord
-                    </a>
-                    <div class="info">
-                        <p>You need to be a member of a server where Psychosonus is installed.</p>
-                        <p>Only server members can control the bot's queue.</p>
-                    </div>
-                </div>
-            </body>
-            </html>
-            """
-            return render_template_string(auth_page_html, auth_url=auth_url)
+            return self._auth_page_template.render(auth_url=auth_url)
         
         @self.app.route('/auth/callback')
         def auth_callback():
@@ -187,39 +272,23 @@ class WebInterface:
                 return f"Authorization error: {error}", 400
             if not code:
                 return "Missing authorization code", 400
-            # Exchange code for token
-            token_data = self.discord_auth.exchange_code(code)
+            # Exchange code for token, then fetch user info and guilds (on the bot loop once its HTTP session is up)
+            if self.bot.http_session:
+                token_data, user_info, user_guilds = asyncio.run_coroutine_threadsafe(
+                    self.discord_auth.login_async(self.bot.http_session, code),
+                    self.bot.loop
+                ).result(timeout=30)
+            else:
+                token_data, user_info, user_guilds = self.discord_auth.login(code)
             if not token_data:
                 logger.error("Failed to exchange authorization code. Redirecting to error page.")
                 return redirect(url_for('auth_page', error='token_exchange_failed'))
-            access_token = token_data['access_token']
-            # Get user info
-            user_info = self.discord_auth.get_user_info(access_token)
             if not user_info:
                 return "Failed to get user information", 400
-            # Get user guilds
-            user_guilds = self.discord_auth.get_user_guilds(access_token)
-            accessible_guilds = []
-            for guild in user_guilds:
-                guild_id = guild['id']
-                bot_guild = self.bot.get_guild(int(guild_id))
-                if bot_guild:
-                    accessible_guilds.append({
-                        'id': guild_id,
-                        'name': guild.get('name', 'Unknown Server'),
-                        'icon': guild.get('icon'),
-                        'bot_connected': (self.bot.voice_client and \
-                                         self.bot.voice_client.guild and \
-                                         self.bot.voice_client.guild.id == int(guild_id))
-                    })
+            accessible_guilds = self.server_permissions.get_user_accessible_guilds(user_guilds)
             if not accessible_guilds:
                 logger.warning(f"No shared servers found for user {user_info['username']}")
-                return render_template_string("""
-                    <h1>No Access</h1>
-                    <p>Please join a server where the bot is added.</p>
-                    <p>Current bot servers: {{ bot_guilds }}</p>
-                    <a href="/auth">Try again</a>
-                """, bot_guilds=[g.name for g in self.bot.guilds])
+                return self._no_access_template.render(bot_guilds=[g.name for g in self.bot.guilds])
             # Create session
             session['user'] = {
                 'user_id': user_info['id'],
@@ -254,63 +323,129 @@ class WebInterface:
         @self.app.route('/api/search', methods=['POST'])
         @self.require_guild_access
         def search_music():
-            """Search for music"""
+            """Search for music, streaming each source's results as newline-delimited JSON"""
             try:
                 data = request.json
+                
+                # Bulk lookup (e.g. importing a track list): top YouTube hits for every query in one batch
+                if isinstance(data.get('queries'), list):
+                    queries = [q.strip() for q in data['queries'][:MAX_BULK_QUERIES] if isinstance(q, str) and q.strip()]
+                    results = asyncio.run_coroutine_threadsafe(
+                        YouTubeManager.search_many_async(self.bot.http_session, queries),
+                        self.bot.loop
+                    ).result(timeout=30)
+                    return Response(dumps_bytes({'success': True, 'results': results}), mimetype='application/json')
+                
                 query = data.get('query', '').strip()
                 
                 if not query:
                     return jsonify({'success': False, 'error': 'No query provided'})
                 
-                tracks = []
-                
-                # Try Spotify first if available and configured
+                # Run every source concurrently on the bot loop so the fastest one reaches the browser first
+                searches = {
+                    asyncio.run_coroutine_threadsafe(
+                        YouTubeManager.search_tracks_async(self.bot.http_session, query, limit=SEARCH_RESULTS_PER_SOURCE),
+                        self.bot.loop
+                    ): 'youtube'
+                }
                 if (self.search_manager and 
                     self.search_manager.is_service_available('spotify')):
-                    try:
-                        spotify_tracks = self.search_manager.search_tracks(query, limit=5)
-                        for track in spotify_tracks:
-                            track.source = 'spotify'
-                            tracks.append(track)
-                        logger.info(f"Found {len(spotify_tracks)} Spotify tracks for: {query}")
-                    except Exception as e:
-                        logger.error(f"Spotify search failed: {e}")
-                
-                # Add YouTube results (always available)
-                try:
-                    youtube_tracks = YouTubeManager.search_tracks(query, limit=8)
-                    for track in youtube_tracks:
-                        track.source = 'youtube'
-                        tracks.append(track)
-                    logger.info(f"Found {len(youtube_tracks)} YouTube tracks for: {query}")
-                except Exception as e:
-                    logger.error(f"YouTube search failed: {e}")
-                
-                # Limit total results
-                tracks = tracks[:10]
-                
-                return jsonify({
-                    'success': True,
-                    'results': [track.to_dict() for track in tracks]
-                })
+                    searches[asyncio.run_coroutine_threadsafe(
+                        self.search_manager.search_tracks_async(query, SEARCH_RESULTS_PER_SOURCE),
+                        self.bot.loop
+                    )] = 'spotify'
                 
             except Exception as e:
                 logger.error(f"Search error: {e}")
                 return jsonify({'success': False, 'error': str(e)})
+            
+            def generate():
+                try:
+                    for future in concurrent.futures.as_completed(searches, timeout=30):
+                        source = searches[future]
+                        try:
+                            tracks = future.result()
+                        except Exception as e:
+                            logger.error(f"{source.capitalize()} search failed: {e}")
+                            continue
+                        
+                        logger.info(f"Found {len(tracks)} {source.capitalize()} tracks for: {query}")
+                        tracks = tracks[:SEARCH_RESULTS_PER_SOURCE]
+                        if not tracks:
+                            continue
+                        for track in tracks:
+                            track.source = source
+                        yield dumps_bytes({'source': source, 'results': tracks}) + b'\n'
+                except concurrent.futures.TimeoutError:
+                    logger.error(f"Search timed out for: {query}")
+            
+            return Response(generate(), mimetype='application/x-ndjson', headers={
+                'Cache-Control': 'no-cache',
+                'X-Accel-Buffering': 'no'
+            })
+        
+        @self.app.route('/api/cache/clear', methods=['POST'])
+        @self.require_guild_access
+        def clear_cache():
+            """Clear cached search results and audio URLs"""
+            try:
+                YouTubeManager.clear_cache()
+                logger.info(f"User {session['user']['username']} cleared the search cache")
+                return jsonify({'success': True, 'message': 'Cache cleared'})
+            except Exception as e:
+                logger.error(f"Cache clear error: {e}")
+                return jsonify({'success': False, 'error': str(e)})
         
         @self.app.route('/api/queue')
         @self.require_auth
         def get_queue():
-            """Get current queue"""
+            """Get current queue (answers 304 when the client already has this version)"""
             try:
-                return jsonify({
-                    'success': True,
-                    'queue': self.bot.music_queue.get_queue_list()
-                })
+                # Cheap check before touching the snapshot: steady-state polls cost no serialization
+                etag = self._queue_etag(self.bot.music_queue.version)
+                if request.if_none_match.contains(etag):
+                    response = Response(status=304)
+                else:
+                    version, payload = self._queue_payload()
+                    etag = self._queue_etag(version)
+                    response = Response(payload, mimetype='application/json')
+                response.set_etag(etag)
+                # Make the browser revalidate on every poll instead of reusing its copy blindly
+                response.headers['Cache-Control'] = 'no-cache'
+                return response
             except Exception as e:
                 logger.error(f"Queue get error: {e}")
                 return jsonify({'success': False, 'error': str(e)})
         
+        @self.app.route('/api/queue/stream')
+        @self.require_auth
+        def stream_queue():
+            """Push the queue to the dashboard whenever it changes (Server-Sent Events)"""
+            music_queue = self.bot.music_queue
+            
+            if not self._stream_slots.acquire(blocking=False):
+                # The dashboard falls back to polling when the stream is refused
+                return jsonify({'success': False, 'error': 'Too many live connections'}), 503
+            
+            def generate():
+                version = music_queue.version
+                yield b"data: " + self._queue_payload()[1] + b"\n\n"
+                while True:
+                    new_version = music_queue.wait_for_change(version, timeout=15)
+                    if new_version == version:
+                        # Keep idle connections from being closed by proxies
+                        yield b": keep-alive\n\n"
+                        continue
+                    version = new_version
+                    yield b"data: " + self._queue_payload()[1] + b"\n\n"
+            
+            response = Response(generate(), mimetype='text/event-stream', headers={
+                'Cache-Control': 'no-cache',
+                'X-Accel-Buffering': 'no'
+            })
+            response.call_on_close(self._stream_slots.release)
+            return response
+        
         @self.app.route('/api/queue/add', methods=['POST'])
         @self.require_guild_access
         def add_to_queue():
@@ -329,12 +464,10 @@ class WebInterface:
                     # Start playing if not already playing and bot is connected
                     if self.bot.voice_client and not self.bot.is_playing:
                         logger.info("Bot is connected but not playing, starting playback...")
-                        try:
-                            future = asyncio.run_coroutine_threadsafe(self.bot.play_next(), self.bot.loop)
-                            future.result(timeout=10)
-                            logger.info("Successfully started playback")
-                        except Exception as e:
-                            logger.error(f"Error starting playback: {e}")
+                        self.bot.request_playback()
+                    elif self.bot.is_playing and self.bot.music_queue.size() == 1:
+                        # The queue was empty when the current track started, so nothing was prefetched
+                        self.bot.request_prefetch()
                     
                     return jsonify({'success': True})
                 else:
@@ -371,6 +504,7 @@ class WebInterface:
             """Clear queue"""
             try:
                 self.bot.music_queue.clear()
+                self.bot.cancel_prefetch()
                 logger.info(f"User {session['user']['username']} cleared the queue")
                 return jsonify({'success': True})
             except Exception as e:
@@ -418,8 +552,9 @@ class WebInterface:
         def skip_song():
             """Skip current song"""
             try:
-                if self.bot.voice_client and self.bot.voice_client.is_playing():
-                    self.bot.voice_client.stop()
+                voice_client = self.bot.voice_client
+                if voice_client and (voice_client.is_playing() or voice_client.is_paused() or self.bot.music_queue.size()):
+                    self.bot.request_skip()
                     logger.info(f"User {session['user']['username']} skipped song")
                     return jsonify({'success': True})
                 else:
@@ -437,9 +572,7 @@ class WebInterface:
                     return jsonify({'success': False, 'error': 'Bot not connected to voice channel'})
                 
                 if self.bot.voice_client.is_playing() or self.bot.voice_client.is_paused():
-                    self.bot.voice_client.stop()
-                    self.bot.is_playing = False
-                    self.bot.music_queue.current_track = None
+                    self.bot.request_stop()
                     logger.info(f"User {session['user']['username']} stopped playback")
                     return jsonify({'success': True, 'message': 'Stopped'})
                 else:
@@ -463,8 +596,7 @@ class WebInterface:
                     return jsonify({'success': False, 'error': 'Queue is empty'})
                 
                 logger.info(f"User {session['user']['username']} force starting playback")
-                future = asyncio.run_coroutine_threadsafe(self.bot.play_next(), self.bot.loop)
-                future.result(timeout=10)
+                self.bot.request_playback()
                 
                 return jsonify({'success': True})
             except Exception as e:
@@ -476,11 +608,7 @@ class WebInterface:
         def shuffle_queue():
             """Shuffle the queue"""
             try:
-                import random
-                with self.bot.music_queue._lock:
-                    queue_list = list(self.bot.music_queue.queue)
-                    random.shuffle(queue_list)
-                    self.bot.music_queue.queue = type(self.bot.music_queue.queue)(queue_list)
+                self.bot.music_queue.shuffle()
                 
                 logger.info(f"User {session['user']['username']} shuffled the queue")
                 return jsonify({'success': True, 'message': 'Queue shuffled'})
@@ -494,15 +622,7 @@ class WebInterface:
             """Leave voice channel"""
             try:
                 if self.bot.voice_client:
-                    future = asyncio.run_coroutine_threadsafe(
-                        self.bot.voice_client.disconnect(), 
-                        self.bot.loop
-                    )
-                    future.result(timeout=5)
-                    self.bot.voice_client = None
-                    self.bot.is_playing = False
-                    self.bot.current_channel = None
-                    self.bot.current_guild_id = None
+                    self.bot.request_leave()
                     logger.info(f"User {session['user']['username']} made bot leave voice channel")
                     return jsonify({'success': True, 'message': 'Left voice channel'})
                 else:
@@ -529,6 +649,8 @@ class WebInterface:
                 voice_paused = self.bot.voice_client.is_paused() if self.bot.voice_client and voice_connected else False
                 # Only allow access if user is in the right guild
                 user_has_access = self.server_permissions.user_has_access(user_id, guild_id) if guild_id and user_id else False
+                # Read once: the bot thread may clear it between a check and the to_dict() call
+                current_track = self.bot.music_queue.current_track
                 return jsonify({
                     'success': True,
                     'connected': voice_connected,
@@ -536,7 +658,8 @@ class WebInterface:
                     'paused': voice_paused,
                     'bot_is_playing': self.bot.is_playing,
                     'queue_size': self.bot.music_queue.size(),
-                    'current_track': self.bot.music_queue.current_track.to_dict() if self.bot.music_queue.current_track else None,
+                    'queue_version': self.bot.music_queue.version,
+                    'current_track': current_track.to_dict() if current_track else None,
                     'voice_channel': self.bot.voice_client.channel.name if self.bot.voice_client and voice_connected else None,
                     'guild_name': bot_guild.name if bot_guild else None,
                     'user_has_access': user_has_access
@@ -548,9 +671,14 @@ class WebInterface:
     
     def run(self):
         """Run Flask app"""
-        port = self.config.get('port', 8888)
-        domain = self.config.get('domain', 'localhost')
+        port = self.config.get_port()
         logger.info(f"Starting web interface on port {port}")
-        domain = self.config.get("domain", "localhost")
         logger.info(f"Discord OAuth2 redirect URI: https://{self.config.get('domain', 'localhost')}/auth/callback")
-        self.app.run(host='0.0.0.0', port=port, debug=False, threaded=True)
\ No newline at end of file
+        
+        if WAITRESS_AVAILABLE:
+            threads = self.config.get('web_threads', 8)
+            logger.info(f"Serving with waitress ({threads} threads)")
+            waitress.serve(self.app, host='0.0.0.0', port=port, threads=threads)
+        else:
+            logger.warning("waitress not installed - falling back to the Flask development server")
+            self.app.run(host='0.0.0.0', port=port, debug=False, threaded=True)
\ No newline at end of file